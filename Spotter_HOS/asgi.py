@@ -9,24 +9,27 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-from django.urls import re_path
-from hos.consumers import TripConsumer, LogConsumer
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Spotter_HOS.settings')
 
-websocket_urlpatterns = [
-    re_path(r'ws/trips/$', TripConsumer.as_asgi()),
-    re_path(r'ws/trips/(?P<trip_id>\w+)/$', TripConsumer.as_asgi()),
-    re_path(r'ws/trips/(?P<trip_id>\w+)/logs/$', LogConsumer.as_asgi()),
-]
+# Set up Django before the consumers import the models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.auth import AuthMiddlewareStack
+from hos.authentication import JWTAuthMiddleware
+from hos.dispatcher import bind_server_loop
+from hos.routing import websocket_urlpatterns
 
-application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+# Background notifications are sent from the server's event loop
+application = bind_server_loop(ProtocolTypeRouter({
+    "http": django_asgi_app,
+    # Session users, or API clients passing their JWT access token as ?token=
     "websocket": AuthMiddlewareStack(
-        URLRouter(
-            websocket_urlpatterns
+        JWTAuthMiddleware(
+            URLRouter(
+                websocket_urlpatterns
+            )
         )
     ),
-})
+}))
@@ -157,11 +157,16 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Read-only requests are authorized from the token's role claims
+        'hos.authentication.ClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
 }
 
+# Trip list pages (cursor paginated); clients can ask for up to TRIP_MAX_PAGE_SIZE with ?page_size=
+TRIP_PAGE_SIZE = int(os.getenv('TRIP_PAGE_SIZE', '50'))
+TRIP_MAX_PAGE_SIZE = int(os.getenv('TRIP_MAX_PAGE_SIZE', '200'))
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # Temporarily allow all origins for development
 CORS_ALLOW_CREDENTIALS = True
@@ -217,21 +222,103 @@ X_FRAME_OPTIONS = 'DENY'
 
 OPENROUTESERVICE_API_KEY = os.getenv('OPENROUTESERVICE_API_KEY', '5b3ce3597851110001cf6248c3edb5f3db8e4ad6b91fb89ecf083bd9')
 
+# Geocoding cache (in-process LRU backed by the GeocodeCache table)
+GEOCODE_CACHE_SIZE = int(os.getenv('GEOCODE_CACHE_SIZE', '2048'))
+GEOCODE_CACHE_TTL = timedelta(days=int(os.getenv('GEOCODE_CACHE_TTL_DAYS', '30')))
+GEOCODE_NEGATIVE_CACHE_TTL = timedelta(hours=int(os.getenv('GEOCODE_NEGATIVE_CACHE_TTL_HOURS', '24')))
+# Seconds between Nominatim requests from one process; its usage policy allows one per second
+NOMINATIM_MIN_INTERVAL = float(os.getenv('NOMINATIM_MIN_INTERVAL', '1'))
+
+# OpenRouteService directions cache, keyed by rounded coordinates plus request options
+DIRECTIONS_CACHE_SIZE = int(os.getenv('DIRECTIONS_CACHE_SIZE', '512'))
+DIRECTIONS_CACHE_TTL = int(os.getenv('DIRECTIONS_CACHE_TTL_SECONDS', str(6 * 3600)))
+DIRECTIONS_COORD_PRECISION = 4
+
+# Outbound HTTP client (Nominatim, OpenRouteService, Overpass)
+OUTBOUND_HTTP_CONNECT_TIMEOUT = float(os.getenv('OUTBOUND_HTTP_CONNECT_TIMEOUT', '3.05'))
+OUTBOUND_HTTP_READ_TIMEOUT = float(os.getenv('OUTBOUND_HTTP_READ_TIMEOUT', '10'))
+OUTBOUND_HTTP_HOST_READ_TIMEOUTS = {
+    'overpass-api.de': 30,  # Overpass queries run with [timeout:25]
+}
+OUTBOUND_HTTP_RETRIES = int(os.getenv('OUTBOUND_HTTP_RETRIES', '2'))
+OUTBOUND_HTTP_BACKOFF_FACTOR = 0.5
+OUTBOUND_HTTP_BACKOFF_MAX = 5
+OUTBOUND_HTTP_POOL_SIZE = int(os.getenv('OUTBOUND_HTTP_POOL_SIZE', '10'))
+
+# Maximum number of external lookups a single request runs in parallel
+EXTERNAL_LOOKUP_CONCURRENCY = int(os.getenv('EXTERNAL_LOOKUP_CONCURRENCY', '8'))
+
+# Worker processes for the batch planning endpoint; 0 plans in-process on threads (e.g. serverless)
+BATCH_PLANNING_WORKERS = int(os.getenv('BATCH_PLANNING_WORKERS', str(os.cpu_count() or 1)))
+
+# Largest number of loads accepted by one batch planning request
+BATCH_PLANNING_MAX_LOADS = int(os.getenv('BATCH_PLANNING_MAX_LOADS', '500'))
+
+# Uncached addresses one batch planning request may send to Nominatim (one per second);
+# loads beyond that come back as errors for the client to retry
+BATCH_GEOCODE_LIMIT = int(os.getenv('BATCH_GEOCODE_LIMIT', '5'))
+
+# Local fuel station file built by `manage.py build_fuel_station_index`; Overpass is used while it is missing
+FUEL_STATIONS_PATH = os.getenv('FUEL_STATIONS_PATH', os.path.join(BASE_DIR, 'hos', 'data', 'fuel_stations.csv'))
+
+# Decoded route geometries and the rendered variants kept per trip, tolerance and format
+ROUTE_GEOMETRY_CACHE_SIZE = int(os.getenv('ROUTE_GEOMETRY_CACHE_SIZE', '256'))
+
 # JWT settings
+# Seconds a token's role claims are trusted for read-only requests without loading the
+# user; older claims fall back to the database until the client refreshes its token.
+# Bounds how long a deactivated or demoted user keeps read access.
+ROLE_CLAIMS_MAX_AGE = int(os.getenv('ROLE_CLAIMS_MAX_AGE', '300'))
+
 SIMPLE_JWT = {
-    'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
+    # Access tokens live as long as their role claims are trusted; refreshing re-derives
+    # the claims, so reads skip the user query for the whole life of a token
+    'ACCESS_TOKEN_LIFETIME': timedelta(seconds=ROLE_CLAIMS_MAX_AGE),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    # Re-derive role claims on refresh so role changes reach the tokens
+    'TOKEN_REFRESH_SERIALIZER': 'hos.tokens.RoleTokenRefreshSerializer',
 }
 
 # Channels configuration
 ASGI_APPLICATION = 'Spotter_HOS.asgi.application'
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
+# With more than one worker process, run `manage.py run_channel_broker` and set
+# CHANNEL_BROKER_URL (unix:///tmp/spotter_hos_channels.sock, or redis://host:6379) so
+# WebSocket events reach clients connected to any worker
+CHANNEL_BROKER_URL = os.getenv('CHANNEL_BROKER_URL')
+if CHANNEL_BROKER_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "hos.channel_layers.BrokerChannelLayer",
+            "CONFIG": {"url": CHANNEL_BROKER_URL},
+        }
     }
-}
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer"
+        }
+    }
+
+# all_trips clients get at most one batched frame per window (0 sends every event as it arrives)
+TRIPS_BROADCAST_WINDOW_MS = int(os.getenv('TRIPS_BROADCAST_WINDOW_MS', '250'))
+
+# WebSocket notifications are queued and sent in the background; when the queue is full
+# new ones are dropped, and a send stuck longer than the timeout (seconds) is abandoned
+NOTIFICATION_QUEUE_SIZE = int(os.getenv('NOTIFICATION_QUEUE_SIZE', '1000'))
+NOTIFICATION_SEND_TIMEOUT = float(os.getenv('NOTIFICATION_SEND_TIMEOUT', '5'))
+
+# Notifications are written to an outbox with the change they announce. `manage.py relay_outbox`
+# sends those still undelivered after OUTBOX_RELAY_DELAY seconds and prunes delivered ones.
+# It needs the broker, so the outbox is only on with CHANNEL_BROKER_URL; when it is on, the
+# relay is a required worker (run it next to the ASGI workers, or from cron as
+# `relay_outbox --once`), or the table grows without bound. Without it, e.g. on Vercel,
+# notifications are sent best effort after commit.
+OUTBOX_ENABLED = os.getenv('OUTBOX_ENABLED', 'True' if CHANNEL_BROKER_URL else 'False') == 'True'
+OUTBOX_RELAY_DELAY = float(os.getenv('OUTBOX_RELAY_DELAY', '10'))
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '500'))
+OUTBOX_RETENTION_HOURS = float(os.getenv('OUTBOX_RETENTION_HOURS', '24'))
 
 # Add CSRF trusted origins
 CSRF_TRUSTED_ORIGINS = [
@@ -4,7 +4,7 @@ from hos.views import (
     AddLogView, CompleteTripView, DailyLogView, TripCreateView, 
     TripDetailView, TripRouteView, TripDailyLogsView, DailyLogGenerator,
     AssignTripView, AvailableTripsView, DriverTripsView, AllTripsView,
-    DriverAssignedTripsView, GenerateTripLogsView
+    DriverAssignedTripsView, GenerateTripLogsView, BatchTripPlanView
 )
 from hos.auth import UserRegistrationView, UserLoginView, UserProfileView
 from rest_framework_simplejwt.views import TokenRefreshView
@@ -23,6 +23,7 @@ urlpatterns = [
     re_path(r'^api/trips/all/?$', AllTripsView.as_view(), name='all-trips'),
     re_path(r'^api/trips/available/?$', AvailableTripsView.as_view(), name='available-trips'),
     re_path(r'^api/trips/my-trips/?$', DriverAssignedTripsView.as_view(), name='driver-assigned-trips'),
+    re_path(r'^api/trips/plan/batch/?$', BatchTripPlanView.as_view(), name='batch-trip-plan'),
     re_path(r'^api/trips/(?P<pk>\d+)/$', TripDetailView.as_view(), name='trip-detail'),
     re_path(r'^api/trips/(?P<pk>\d+)/route/$', TripRouteView.as_view(), name='trip-route'),
     re_path(r'^api/trips/(?P<pk>\d+)/complete/$', CompleteTripView.as_view(), name='trip-complete'),
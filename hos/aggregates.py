@@ -0,0 +1,154 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from hos.models import STATUS_TOTAL_FIELDS as STATUS_FIELDS, DailyLogSheet, DrivingLog
+
+
+def _midnight(day, tzinfo):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()), tzinfo)
+
+
+def day_spans(start_time, end_time):
+    """Split a log period at local midnight into (date, hours) pairs"""
+    if start_time is None or end_time is None or end_time <= start_time:
+        return
+    tz = timezone.get_current_timezone()
+    start, end = timezone.localtime(start_time, tz), timezone.localtime(end_time, tz)
+    day = start.date()
+    while start < end:
+        next_midnight = _midnight(day + timedelta(days=1), tz)
+        stop = min(end, next_midnight)
+        yield day, (stop - start).total_seconds() / 3600
+        day, start = day + timedelta(days=1), stop
+
+
+def add_log(deltas, trip_id, status, start_time, end_time, sign=1):
+    """Accumulate a log's hours into {(trip_id, date): {field: hours}}"""
+    field = STATUS_FIELDS.get(status)
+    if field is None:
+        return
+    for day, hours in day_spans(start_time, end_time):
+        totals = deltas[(trip_id, day)]
+        totals[field] = totals.get(field, 0) + sign * hours
+
+
+def new_deltas():
+    return defaultdict(dict)
+
+
+def _nonzero(deltas):
+    return {key: values for key, values in deltas.items() if any(values.values())}
+
+
+def _sheets_query(keys):
+    query = Q()
+    for trip_id, day in keys:
+        query |= Q(trip_id=trip_id, date=day)
+    return DailyLogSheet.objects.filter(query)
+
+
+def apply_deltas(deltas):
+    """
+    Apply one log change's per-day totals, for a log that is already saved: existing
+    DailyLogSheet rows are incremented in the database with F expressions, missing rows
+    are built from all of that day's logs. Rows that would only receive negative deltas
+    are skipped, as their logs are being removed along with the trip.
+    """
+    deltas = _nonzero(deltas)
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        existing = set(_sheets_query(deltas).values_list('trip_id', 'date'))
+        for key, values in deltas.items():
+            if key in existing:
+                _increment(key, values)
+            elif any(value > 0 for value in values.values()):
+                _create(key, values)
+
+
+def _increment(key, values):
+    trip_id, day = key
+    return DailyLogSheet.objects.filter(trip_id=trip_id, date=day).update(
+        **{field: F(field) + value for field, value in values.items()}
+    )
+
+
+def _create(key, values):
+    try:
+        with transaction.atomic():
+            rebuild_day(*key)
+    except IntegrityError:
+        # Another writer created the row first, without these logs; add them to it
+        _increment(key, values)
+
+
+def apply_logs(logs, sign=1):
+    """
+    Add (or with sign=-1 remove) the hours of DrivingLogs written without signals, e.g.
+    by bulk_create, in three queries at most: existing rows are incremented with one
+    bulk_update and missing ones inserted with one bulk_create. Missing rows are built
+    from these logs alone, since every day that already had logs has its row.
+    """
+    deltas = new_deltas()
+    for log in logs:
+        add_log(deltas, log.trip_id, log.status, log.start_time, log.end_time, sign)
+    deltas = _nonzero(deltas)
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        updated, missing = [], []
+        existing = {(sheet.trip_id, sheet.date): sheet for sheet in _sheets_query(deltas).only('id', 'trip_id', 'date')}
+        for key, values in deltas.items():
+            sheet = existing.get(key)
+            if sheet is not None:
+                for field in STATUS_FIELDS.values():
+                    setattr(sheet, field, F(field) + values.get(field, 0))
+                updated.append(sheet)
+            elif any(value > 0 for value in values.values()):
+                missing.append(DailyLogSheet(trip_id=key[0], date=key[1], **values))
+
+        if updated:
+            DailyLogSheet.objects.bulk_update(updated, list(STATUS_FIELDS.values()))
+        if missing:
+            try:
+                with transaction.atomic():
+                    DailyLogSheet.objects.bulk_create(missing)
+            except IntegrityError:
+                # Another writer created some of these rows first; fall back to row by row
+                apply_deltas({(sheet.trip_id, sheet.date): deltas[(sheet.trip_id, sheet.date)] for sheet in missing})
+
+
+def rebuild(trip_ids=None):
+    """
+    Recompute DailyLogSheet rows from the DrivingLogs, for all trips or the given ones.
+    Returns the number of rows written.
+    """
+    logs = DrivingLog.objects.exclude(end_time=None).order_by()  # order doesn't matter; skip the sort
+    sheets = DailyLogSheet.objects.all()
+    if trip_ids is not None:
+        logs = logs.filter(trip_id__in=trip_ids)
+        sheets = sheets.filter(trip_id__in=trip_ids)
+
+    deltas = new_deltas()
+    for trip_id, status, start_time, end_time in logs.values_list('trip_id', 'status', 'start_time', 'end_time').iterator():
+        add_log(deltas, trip_id, status, start_time, end_time)
+
+    rows = [DailyLogSheet(trip_id=trip_id, date=day, **values) for (trip_id, day), values in deltas.items()]
+    with transaction.atomic():
+        sheets.delete()
+        DailyLogSheet.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def rebuild_day(trip_id, date):
+    """Recompute one trip's totals for a date with a single aggregate query; returns the DailyLogSheet"""
+    tz = timezone.get_current_timezone()
+    totals = DrivingLog.objects.filter(trip_id=trip_id).daily_totals(
+        _midnight(date, tz), _midnight(date + timedelta(days=1), tz)
+    )
+    daily_log, _ = DailyLogSheet.objects.update_or_create(trip_id=trip_id, date=date, defaults=totals)
+    return daily_log
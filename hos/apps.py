@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 class HosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'hos'
\ No newline at end of file
+    name = 'hos'
+
+    def ready(self):
+        # Keep DailyLogSheet totals in step with DrivingLog changes
+        from hos import signals  # noqa: F401
@@ -4,8 +4,11 @@ from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.authentication import SessionAuthentication
 from django.db import transaction
+from hos import roles
+from hos.tokens import RoleRefreshToken
 
 User = get_user_model()
 
@@ -47,7 +50,7 @@ class UserRegistrationView(generics.CreateAPIView):
         user.groups.add(group)
         
         # Generate tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = RoleRefreshToken.for_user(user)
         
         return Response({
             'user': {
@@ -90,10 +93,10 @@ class UserLoginView(APIView):
             )
         
         # Determine user role
-        role = 'admin' if user.is_staff else 'supervisor' if user.groups.filter(name='supervisors').exists() else 'driver'
+        role = roles.get_role(user)
         
         # Generate tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = RoleRefreshToken.for_user(user)
         
         return Response({
             'user': {
@@ -109,11 +112,13 @@ class UserLoginView(APIView):
         })
 
 class UserProfileView(APIView):
+    # The profile fields are not in the token claims, so always load the user
+    authentication_classes = [JWTAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         user = request.user
-        role = 'admin' if user.is_staff else 'supervisor' if user.groups.filter(name='supervisors').exists() else 'driver'
+        role = roles.get_role(user)
         
         return Response({
             'id': user.id,
@@ -0,0 +1,81 @@
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_to_epoch
+from hos import roles
+
+
+class ClaimsUser(TokenUser):
+    """A user built from an access token's role claims, without a user table lookup"""
+
+    def __init__(self, token):
+        super().__init__(token)
+        setattr(self, roles.CACHE_ATTR, frozenset(token.get('groups', ())))
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Authorize read-only requests from the token's role claims. Writes, tokens issued
+    before the claims existed, and claims read from the database more than
+    ROLE_CLAIMS_MAX_AGE seconds ago still load the user, so a deactivated or demoted
+    user loses access within that window rather than when the access token expires.
+    """
+
+    def authenticate(self, request):
+        if request.method not in SAFE_METHODS:
+            return super().authenticate(request)
+
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return self.get_read_user(validated_token), validated_token
+
+    def get_read_user(self, validated_token):
+        """The user to authorize reads with: built from fresh claims, loaded otherwise"""
+        if not self.claims_are_fresh(validated_token):
+            return self.get_user(validated_token)
+        return ClaimsUser(validated_token)
+
+    def claims_are_fresh(self, token):
+        checked_at = token.get('roles_checked_at')
+        if 'role' not in token or checked_at is None:
+            return False
+        max_age = getattr(settings, 'ROLE_CLAIMS_MAX_AGE', 300)
+        return datetime_to_epoch(aware_utcnow()) - checked_at <= max_age
+
+
+@database_sync_to_async
+def get_websocket_user(raw_token):
+    authentication = ClaimsJWTAuthentication()
+    try:
+        return authentication.get_read_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticate WebSocket connections from an access token in the query string
+    (ws/trips/1/?token=<access>), since browsers can't set an Authorization header on
+    a WebSocket. Sockets read only, so the user is resolved as ClaimsJWTAuthentication
+    does for reads. Without a token, the session user set by AuthMiddleware is kept.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        tokens = parse_qs(scope.get('query_string', b'').decode()).get('token')
+        if tokens:
+            scope['user'] = await get_websocket_user(tokens[-1])
+        return await super().__call__(scope, receive, send)
@@ -0,0 +1,126 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import django
+from django.conf import settings
+from hos import directions, planner
+from hos.geometry import haversine_miles
+
+# Straight-line to road miles, used when no route can be fetched for a load
+ROAD_DISTANCE_FACTOR = 1.2
+
+
+def plan_load(load):
+    """Estimate the route and plan the HOS schedule for one load; runs in a worker process"""
+    pickup, dropoff = load['pickup_coordinates'], load['dropoff_coordinates']
+    route = directions.get_route(pickup, dropoff)
+    if route:
+        distance_miles = route['distance'] / 1609.34
+        driving_hours = route['duration'] / 3600
+        route_source = 'route'
+    else:
+        distance_miles = haversine_miles(*pickup, *dropoff) * ROAD_DISTANCE_FACTOR
+        driving_hours = distance_miles / planner.DRIVING_SPEED
+        route_source = 'estimate'
+
+    intervals = planner.plan_trip(
+        load['start_time'],
+        driving_hours=driving_hours,
+        distance_miles=distance_miles,
+        current_cycle_used=load['current_cycle_used']
+    )
+    hours_by_activity = planner.hours_by_activity(intervals)
+    result = {
+        'reference': load.get('reference'),
+        'route_source': route_source,
+        'total_distance_miles': round(distance_miles, 2),
+        'driving_hours': round(driving_hours, 2),
+        'total_hours': round((intervals[-1].end - intervals[0].start).total_seconds() / 3600, 2),
+        'total_days': len(planner.split_days(intervals, pad=False)),
+        'start_time': intervals[0].start.isoformat(),
+        'arrival_time': intervals[-1].end.isoformat(),
+        'break_hours': hours_by_activity['break'],
+        'fuel_stops': sum(1 for interval in intervals if interval.activity == 'fuel'),
+        'resets': sum(1 for interval in intervals if interval.activity in ('reset', 'restart')),
+    }
+    if load.get('include_schedule'):
+        result['schedule'] = [
+            [interval.status, interval.start.isoformat(), interval.end.isoformat(), interval.activity]
+            for interval in intervals
+        ]
+    return result
+
+
+def _init_worker():
+    # Spawned workers (macOS, Windows) start without Django configured
+    if not settings.configured or not django.apps.apps.ready:
+        django.setup()
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process-wide planning pool, or None when BATCH_PLANNING_WORKERS is 0"""
+    global _executor, _executor_pid
+    workers = getattr(settings, 'BATCH_PLANNING_WORKERS', os.cpu_count())
+    if not workers:
+        return None
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+                _executor_pid = pid
+    return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def plan_loads(loads):
+    """
+    Plan every load and yield (index, result) pairs as they finish.
+
+    A load that fails yields {'error': ...} in place of its result, so one bad
+    load does not sink the batch.
+    """
+    executor = get_executor()
+    if executor is None:
+        # No process pool (e.g. serverless); still overlap the route lookups
+        limit = getattr(settings, 'EXTERNAL_LOOKUP_CONCURRENCY', 8)
+        with ThreadPoolExecutor(max_workers=max(1, min(limit, len(loads)))) as pool:
+            yield from _completed(pool, loads)
+        return
+
+    try:
+        yield from _completed(executor, loads)
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool for the next batch
+        _reset_executor()
+        raise
+
+
+def _completed(executor, loads):
+    futures = {executor.submit(plan_load, load): index for index, load in enumerate(loads)}
+    try:
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                yield index, future.result()
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                yield index, {'reference': loads[index].get('reference'), 'error': str(e)}
+    finally:
+        # The client may stop reading a stream; don't leave its loads queued
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from hos import outbox
+from hos.dispatcher import dispatcher
+from hos.serializers import DrivingLogSerializer, TripSummarySerializer
+
+# WebSocket events carry only what changed, tagged with the trip's version:
+#
+#   {"type": "trip_delta", "trip_id": 1, "version": 8, "changes": {"status": "IN_PROGRESS"}, "log": {...}}
+#
+# Every delta bumps the version by one, so a client of trip_<id> that sees a gap asks
+# its socket for a snapshot ({"type": "snapshot"}; the socket must be opened with
+# ?token=<access token>, or by a session user). all_trips only gets deltas that change
+# trip fields, so list clients apply a delta when its version is newer than the one they hold.
+
+
+def notify(group, message):
+    """
+    Record a channel layer message in the outbox, in the caller's transaction, and hand it
+    to the background dispatcher once that commits. relay_outbox sends it if that fails.
+    With OUTBOX_ENABLED off there is no relay, so nothing is recorded.
+    """
+    if not getattr(settings, 'OUTBOX_ENABLED', False):
+        transaction.on_commit(lambda: dispatcher.send(group, message))
+        return
+    event = outbox.record(group, message)
+    transaction.on_commit(lambda: dispatcher.send(group, message, event_id=event.id))
+
+
+def save_trip(trip, fields=()):
+    """Save the given fields and bump the trip's version in one atomic update"""
+    with transaction.atomic():
+        trip.version = F('version') + 1
+        trip.save(update_fields=[*fields, 'version'])
+        # The row stays locked until commit, so this reads our own increment
+        trip.refresh_from_db(fields=['version'])
+    return trip.version
+
+
+def serialize_fields(trip, fields):
+    """Summary representation of just the given fields"""
+    serializer_fields = TripSummarySerializer(trip).fields
+    changes = {}
+    for name in fields:
+        field = serializer_fields[name]
+        value = field.get_attribute(trip)
+        changes[name] = None if value is None else field.to_representation(value)
+    return changes
+
+
+def trip_delta(trip, fields=(), log=None):
+    delta = {'trip_id': trip.id, 'version': trip.version, 'changes': serialize_fields(trip, fields)}
+    if log is not None:
+        delta['log'] = DrivingLogSerializer(log).data
+    return delta
+
+
+def broadcast_trip_changes(trip, fields=(), log=None):
+    """Send a trip's changed fields, and optionally a new log, to its watchers"""
+    delta = trip_delta(trip, fields, log)
+    notify(f'trip_{trip.id}', {'type': 'trip_delta', **delta})
+    if fields:
+        # Trip lists don't show logs
+        delta.pop('log', None)
+        notify('all_trips', {'type': 'trip_delta', **delta})
+
+
+def broadcast_trip_created(trip):
+    notify(
+        'all_trips',
+        {
+            'type': 'trip_created',
+            'trip': TripSummarySerializer(trip).data
+        }
+    )
+
+
+class TripEventBuffer:
+    """
+    Collects all_trips events and merges them per trip, so a busy trip costs one entry
+    per flush however many times it changed. A delta older than the pending entry only
+    fills in fields that have no newer value.
+    """
+
+    def __init__(self):
+        self.events = {}
+
+    def __len__(self):
+        return len(self.events)
+
+    def add(self, event):
+        if event['type'] != 'trip_delta':
+            # trip_created and trip_updated carry the whole trip and replace anything pending
+            self.events[event['trip']['id']] = {**event, 'trip': dict(event['trip'])}
+            return
+
+        pending = self.events.get(event['trip_id'])
+        if pending is None:
+            self.events[event['trip_id']] = {**event, 'changes': dict(event['changes'])}
+            return
+
+        # Merge into the pending delta's changes, or into the pending whole trip
+        fields = pending['trip'] if 'trip' in pending else pending['changes']
+        holder = fields if 'trip' in pending else pending
+        if event['version'] >= holder.get('version', 0):
+            fields.update(event['changes'])
+            holder['version'] = event['version']
+        else:
+            for name, value in event['changes'].items():
+                fields.setdefault(name, value)
+
+    def flush(self):
+        """Return the merged events in arrival order and start over"""
+        events, self.events = list(self.events.values()), {}
+        return events
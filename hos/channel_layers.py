@@ -0,0 +1,323 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import string
+from urllib.parse import unquote, urlparse
+from channels.exceptions import ChannelFull
+from channels.layers import InMemoryChannelLayer
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BROKER_URL = 'unix:///tmp/spotter_hos_channels.sock'
+DEFAULT_TOPIC = 'hos.channels'
+
+
+# A subset of the Redis protocol (RESP2): enough for PUBLISH/SUBSCRIBE, so the layer
+# talks to a real Redis server or to the local broker below without any changes
+
+def encode_array(*items):
+    """Encode a command, or a pub/sub reply, as an array of bulk strings and integers"""
+    parts = [b'*%d\r\n' % len(items)]
+    for item in items:
+        if isinstance(item, int):
+            parts.append(b':%d\r\n' % item)
+            continue
+        if isinstance(item, str):
+            item = item.encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(item), item))
+    return b''.join(parts)
+
+
+class ReplyError(Exception):
+    pass
+
+
+async def read_reply(reader):
+    line = await reader.readuntil(b'\r\n')
+    kind, rest = line[:1], line[1:-2]
+    if kind == b'+':
+        return rest.decode()
+    if kind == b'-':
+        raise ReplyError(rest.decode())
+    if kind == b':':
+        return int(rest)
+    if kind == b'$':
+        length = int(rest)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if kind == b'*':
+        length = int(rest)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise ReplyError(f'Unexpected reply {line!r}')
+
+
+async def open_connection(url):
+    """Connect to unix:///path/to.sock or redis://[:password@]host[:port]"""
+    parsed = urlparse(url)
+    if parsed.scheme == 'unix':
+        reader, writer = await asyncio.open_unix_connection(parsed.path)
+    elif parsed.scheme in ('redis', 'tcp'):
+        reader, writer = await asyncio.open_connection(parsed.hostname or 'localhost', parsed.port or 6379)
+    else:
+        raise ValueError(f'Unsupported channel broker URL: {url}')
+    if parsed.password:
+        writer.write(encode_array('AUTH', unquote(parsed.password)))
+        await writer.drain()
+        await read_reply(reader)
+    return reader, writer
+
+
+class BrokerChannelLayer(InMemoryChannelLayer):
+    """
+    Channel layer that fans group and channel messages out to every worker process
+    through a pub/sub broker: the `run_channel_broker` command on a Unix socket, or Redis.
+
+    Groups and queues stay in the process that owns the consumers; each message is
+    delivered locally and published once, and the other processes deliver it to their
+    own group members. If the broker is down, messages still reach local consumers.
+    """
+
+    def __init__(self, url=DEFAULT_BROKER_URL, topic=DEFAULT_TOPIC, reconnect_delay=1, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.topic = topic
+        self.reconnect_delay = reconnect_delay
+        self.client_id = ''.join(random.choice(string.ascii_letters) for _ in range(12))
+        self.subscriber = None
+        self.publisher = None
+        self.publisher_loop = None
+        self.publisher_lock = None
+
+    # Channel layer API
+
+    async def new_channel(self, prefix='specific.'):
+        # Consumers ask for their channel name on connect; start listening on their loop
+        self._ensure_subscriber()
+        return '%s.%s!%s' % (
+            prefix,
+            self.client_id,
+            ''.join(random.choice(string.ascii_letters) for _ in range(12)),
+        )
+
+    async def send(self, channel, message):
+        if self._is_local(channel):
+            await super().send(channel, message)
+        else:
+            assert isinstance(message, dict), 'message is not a dict'
+            assert self.valid_channel_name(channel), 'Channel name not valid'
+            await self._publish('channel', channel, message)
+
+    async def group_add(self, group, channel):
+        await super().group_add(group, channel)
+        self._ensure_subscriber()
+
+    async def group_send(self, group, message):
+        await super().group_send(group, message)
+        await self._publish('group', group, message)
+
+    async def close(self):
+        if self.subscriber is not None:
+            self.subscriber.cancel()
+            self.subscriber = None
+        self._drop_publisher()
+
+    def _is_local(self, channel):
+        return f'.{self.client_id}!' in channel
+
+    # Publishing
+
+    async def _publish(self, kind, target, message):
+        data = json.dumps(
+            {'origin': self.client_id, 'kind': kind, 'target': target, 'message': message},
+            cls=DjangoJSONEncoder,
+        )
+        command = encode_array('PUBLISH', self.topic, data)
+        loop = asyncio.get_running_loop()
+        if self.publisher_loop is None or self.publisher_loop.is_closed():
+            # Keep a connection on the first loop that publishes: normally the consumers',
+            # the notification dispatcher's or the outbox relay's
+            self._bind_publisher(loop)
+
+        if self.publisher_loop is not loop:
+            # Some other loop (e.g. a throwaway one from async_to_sync); a one-off
+            # connection is cheaper than tracking one per loop
+            try:
+                reader, writer = await open_connection(self.url)
+                try:
+                    writer.write(command)
+                    await writer.drain()
+                    await read_reply(reader)
+                finally:
+                    writer.close()
+            except (OSError, EOFError, ReplyError) as e:
+                logger.warning('Channel broker %s unreachable, %s %s only reached this process: %s',
+                               self.url, kind, target, e)
+            return
+
+        if self.publisher_lock is None:
+            self.publisher_lock = asyncio.Lock()
+        async with self.publisher_lock:
+            for attempt in range(2):
+                try:
+                    if self.publisher is None:
+                        self.publisher = await open_connection(self.url)
+                    reader, writer = self.publisher
+                    writer.write(command)
+                    await writer.drain()
+                    await read_reply(reader)
+                    return
+                except asyncio.CancelledError:
+                    # Timed out mid-command; the reply may still arrive, so don't reuse the connection
+                    self._drop_publisher()
+                    raise
+                except (OSError, EOFError, ReplyError) as e:
+                    # The broker restarted or dropped us; reconnect once before giving up
+                    self._drop_publisher()
+                    error = e
+            logger.warning('Channel broker %s unreachable, %s %s only reached this process: %s',
+                           self.url, kind, target, error)
+
+    def _drop_publisher(self):
+        if self.publisher is not None:
+            writer = self.publisher[1]
+            if self.publisher_loop is asyncio.get_running_loop():
+                writer.close()
+            elif not self.publisher_loop.is_closed():
+                self.publisher_loop.call_soon_threadsafe(writer.close)
+            self.publisher = None
+
+    def _bind_publisher(self, loop):
+        if self.publisher_loop is not loop:
+            self._drop_publisher()
+            self.publisher_loop, self.publisher_lock = loop, None
+
+    # Receiving
+
+    def _ensure_subscriber(self):
+        if self.subscriber is None or self.subscriber.done():
+            self.subscriber = asyncio.get_running_loop().create_task(self._subscribe())
+            self._bind_publisher(self.subscriber.get_loop())
+
+    async def _subscribe(self):
+        warned = False
+        while True:
+            try:
+                reader, writer = await open_connection(self.url)
+                try:
+                    writer.write(encode_array('SUBSCRIBE', self.topic))
+                    await writer.drain()
+                    warned = False
+                    while True:
+                        reply = await read_reply(reader)
+                        if isinstance(reply, list) and len(reply) == 3 and reply[0] == b'message':
+                            await self._deliver(reply[2])
+                finally:
+                    writer.close()
+            except (OSError, EOFError, ReplyError) as e:
+                if not warned:
+                    logger.warning('Lost channel broker %s, retrying every %ss: %s', self.url, self.reconnect_delay, e)
+                    warned = True
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _deliver(self, data):
+        try:
+            payload = json.loads(data)
+            if payload['origin'] == self.client_id:
+                return
+            if payload['kind'] == 'group':
+                await InMemoryChannelLayer.group_send(self, payload['target'], payload['message'])
+            elif self._is_local(payload['target']):
+                await InMemoryChannelLayer.send(self, payload['target'], payload['message'])
+        except ChannelFull:
+            pass
+        except (ValueError, KeyError, TypeError, AssertionError) as e:
+            # Someone else publishing on the topic; don't let it stop the subscriber
+            logger.warning('Ignoring malformed channel broker message: %s', e)
+
+
+class ChannelBroker:
+    """
+    Minimal Redis-compatible pub/sub server (PING, AUTH, SUBSCRIBE, UNSUBSCRIBE,
+    PUBLISH, QUIT) that relays channel layer messages between the worker processes
+    on one host.
+    """
+
+    # Disconnect subscribers that stop reading rather than buffer for them forever
+    MAX_SUBSCRIBER_BUFFER = 8 * 1024 * 1024
+
+    def __init__(self):
+        self.subscribers = {}  # topic -> set of writers
+
+    async def serve(self, url):
+        parsed = urlparse(url)
+        if parsed.scheme == 'unix':
+            if os.path.exists(parsed.path):
+                os.unlink(parsed.path)  # left behind by a broker that was killed
+            server = await asyncio.start_unix_server(self.handle, parsed.path)
+        elif parsed.scheme in ('redis', 'tcp'):
+            server = await asyncio.start_server(self.handle, parsed.hostname or 'localhost', parsed.port or 6379)
+        else:
+            raise ValueError(f'Unsupported channel broker URL: {url}')
+        return server
+
+    async def handle(self, reader, writer):
+        topics = set()
+        try:
+            while True:
+                command = await read_reply(reader)
+                if not isinstance(command, list) or not command:
+                    break
+                name, args = command[0].upper(), command[1:]
+                if name == b'PUBLISH' and len(args) == 2:
+                    writer.write(b':%d\r\n' % self.publish(*args))
+                elif name == b'SUBSCRIBE':
+                    for topic in args:
+                        self.subscribers.setdefault(topic, set()).add(writer)
+                        topics.add(topic)
+                        writer.write(encode_array(b'subscribe', topic, len(topics)))
+                elif name == b'UNSUBSCRIBE':
+                    for topic in args or list(topics):
+                        self._unsubscribe(topic, writer)
+                        topics.discard(topic)
+                        writer.write(encode_array(b'unsubscribe', topic, len(topics)))
+                elif name == b'PING':
+                    writer.write(b'+PONG\r\n')
+                elif name in (b'AUTH', b'SELECT'):
+                    writer.write(b'+OK\r\n')
+                elif name == b'QUIT':
+                    writer.write(b'+OK\r\n')
+                    break
+                else:
+                    writer.write(b'-ERR unknown command\r\n')
+                await writer.drain()
+        except (OSError, EOFError, ReplyError, ValueError):
+            pass
+        finally:
+            for topic in topics:
+                self._unsubscribe(topic, writer)
+            writer.close()
+
+    def publish(self, topic, data):
+        message = encode_array(b'message', topic, data)
+        receivers = 0
+        for writer in list(self.subscribers.get(topic, ())):
+            if writer.is_closing() or writer.transport.get_write_buffer_size() > self.MAX_SUBSCRIBER_BUFFER:
+                self._unsubscribe(topic, writer)
+                writer.close()
+                continue
+            writer.write(message)
+            receivers += 1
+        return receivers
+
+    def _unsubscribe(self, topic, writer):
+        writers = self.subscribers.get(topic)
+        if writers is not None:
+            writers.discard(writer)
+            if not writers:
+                del self.subscribers[topic]
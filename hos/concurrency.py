@@ -0,0 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+
+def run_concurrently(calls, max_workers=None):
+    """Run zero-argument callables on a bounded thread pool and return their results in order"""
+    calls = list(calls)
+    if len(calls) <= 1:
+        return [call() for call in calls]
+
+    limit = max_workers or getattr(settings, 'EXTERNAL_LOOKUP_CONCURRENCY', 8)
+    with ThreadPoolExecutor(max_workers=min(limit, len(calls))) as executor:
+        futures = [executor.submit(call) for call in calls]
+        return [future.result() for future in futures]
+
+
+async def iterate_in_thread(iterable):
+    """Iterate a blocking iterator from async code, running each step on a worker thread"""
+    iterator = iter(iterable)
+    done = object()
+    while True:
+        item = await sync_to_async(next, thread_sensitive=False)(iterator, done)
+        if item is done:
+            return
+        yield item
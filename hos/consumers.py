@@ -1,8 +1,39 @@
+import asyncio
 import json
+from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from .models import Trip, DrivingLog, Log
-from .serializers import TripSerializer, DrivingLogSerializer
+from .models import Trip, DrivingLog
+from .serializers import TripSerializer, TripSummarySerializer, DrivingLogSerializer
+from .broadcasts import TripEventBuffer
+from . import roles
+
+def can_view_trip(user, trip):
+    # Same rule as IsTripDriverOrAdmin: admins and supervisors see any trip, drivers their own
+    return roles.is_admin_or_supervisor(user) or trip.driver_id == user.id
+
+@database_sync_to_async
+def get_trip_snapshot(user, trip_id):
+    trip = Trip.objects.select_related('driver').prefetch_related('logs', 'daily_logs').filter(pk=trip_id).first()
+    return TripSerializer(trip).data if trip and can_view_trip(user, trip) else None
+
+@database_sync_to_async
+def get_trip_summary(user, trip_id):
+    trip = Trip.objects.select_related('driver').filter(pk=trip_id).first()
+    # Unassigned trips are listed to everyone by AvailableTripsView
+    visible = trip and (can_view_trip(user, trip) or (trip.driver_id is None and trip.status == 'NOT_STARTED'))
+    return TripSummarySerializer(trip).data if visible else None
+
+async def reject_anonymous(consumer):
+    """Send an error frame and return True unless the socket's user is logged in"""
+    user = consumer.scope.get('user')
+    if user is not None and user.is_authenticated:
+        return False
+    await consumer.send(text_data=json.dumps({
+        'type': 'error',
+        'error': 'Authentication required'
+    }))
+    return True
 
 class TripConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -26,6 +57,17 @@ class TripConsumer(AsyncWebsocketConsumer):
 
     async def receive(self, text_data):
         text_data_json = json.loads(text_data)
+
+        # Clients that missed a version ask for the full trip; trips they may not see come back as null
+        if text_data_json.get('type') == 'snapshot' and self.trip_id:
+            if await reject_anonymous(self):
+                return
+            await self.send(text_data=json.dumps({
+                'type': 'trip_snapshot',
+                'trip': await get_trip_snapshot(self.scope['user'], self.trip_id)
+            }))
+            return
+
         message = text_data_json['message']
 
         # Send message to room group
@@ -59,9 +101,20 @@ class TripConsumer(AsyncWebsocketConsumer):
             'log': event['log']
         }))
 
+    async def trip_delta(self, event):
+        # Send the changed fields (and new log, if any) to WebSocket
+        await self.send(text_data=json.dumps(event))
+
 class TripsConsumer(AsyncWebsocketConsumer):
+    """
+    Trip list updates for every trip. Events are merged per trip and sent as one
+    trips_batch frame per TRIPS_BROADCAST_WINDOW_MS, so a client's message rate stays
+    bounded however busy the fleet is.
+    """
     async def connect(self):
         self.room_group_name = 'all_trips'
+        self.pending = TripEventBuffer()
+        self.flush_task = None
 
         # Join room group
         await self.channel_layer.group_add(
@@ -72,6 +125,9 @@ class TripsConsumer(AsyncWebsocketConsumer):
         await self.accept()
 
     async def disconnect(self, close_code):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
@@ -80,6 +136,17 @@ class TripsConsumer(AsyncWebsocketConsumer):
 
     async def receive(self, text_data):
         text_data_json = json.loads(text_data)
+
+        # List clients that missed a version ask for that trip's summary
+        if text_data_json.get('type') == 'snapshot' and text_data_json.get('trip_id'):
+            if await reject_anonymous(self):
+                return
+            await self.send(text_data=json.dumps({
+                'type': 'trip_snapshot',
+                'trip': await get_trip_summary(self.scope['user'], text_data_json['trip_id'])
+            }))
+            return
+
         message = text_data_json.get('message', '')
 
         # Send message to room group
@@ -100,18 +167,34 @@ class TripsConsumer(AsyncWebsocketConsumer):
         }))
 
     async def trip_created(self, event):
-        # Send trip created notification to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'trip_created',
-            'trip': event['trip']
-        }))
+        await self.queue_event(event)
 
     async def trip_updated(self, event):
-        # Send trip updated notification to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'trip_updated',
-            'trip': event['trip']
-        }))
+        await self.queue_event(event)
+
+    async def trip_delta(self, event):
+        await self.queue_event(event)
+
+    async def queue_event(self, event):
+        window = getattr(settings, 'TRIPS_BROADCAST_WINDOW_MS', 250) / 1000
+        self.pending.add(event)
+        if window <= 0:
+            await self.flush_events()
+        elif self.flush_task is None:
+            # The first event of a window schedules its flush; later ones just merge in
+            self.flush_task = asyncio.ensure_future(self.flush_later(window))
+
+    async def flush_later(self, window):
+        await asyncio.sleep(window)
+        self.flush_task = None
+        await self.flush_events()
+
+    async def flush_events(self):
+        if self.pending:
+            await self.send(text_data=json.dumps({
+                'type': 'trips_batch',
+                'events': self.pending.flush()
+            }))
 
 class LogConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -0,0 +1,95 @@
+import requests
+from django.conf import settings
+from hos import http_client
+from hos.cache import LRUCache, MISSING
+
+DIRECTIONS_URL = "https://api.openrouteservice.org/v2/directions/driving-car"
+
+# Coordinates are rounded before keying, so repeated lanes share an entry (4 places is ~11 m)
+COORD_PRECISION = getattr(settings, 'DIRECTIONS_COORD_PRECISION', 4)
+
+_route_cache = LRUCache(
+    maxsize=getattr(settings, 'DIRECTIONS_CACHE_SIZE', 512),
+    ttl=getattr(settings, 'DIRECTIONS_CACHE_TTL', 6 * 3600),
+)
+
+
+def _cache_key(start, end, preference, radiuses, instructions, units):
+    return (
+        round(float(start[0]), COORD_PRECISION), round(float(start[1]), COORD_PRECISION),
+        round(float(end[0]), COORD_PRECISION), round(float(end[1]), COORD_PRECISION),
+        preference,
+        tuple(radiuses) if radiuses else None,
+        bool(instructions),
+        units,
+    )
+
+
+def _parse_route(route):
+    steps = []
+    for segment in route.get('segments', []):
+        for step in segment.get('steps', []):
+            steps.append({
+                'instruction': step.get('instruction'),
+                'distance': step.get('distance', 0),
+                'duration': step.get('duration', 0),
+                'way_points': step.get('way_points'),
+            })
+    summary = route.get('summary', {})
+    return {
+        'distance': summary.get('distance', 0),
+        'duration': summary.get('duration', 0),
+        'geometry': route.get('geometry'),
+        'steps': steps,
+    }
+
+
+def get_route(start, end, preference='fastest', radiuses=None, instructions=False, units='m'):
+    """
+    Fetch a driving-car route between two [lat, lng] points from OpenRouteService.
+
+    Returns a dict with distance (in ``units``), duration (seconds), the encoded
+    geometry and the flattened steps, or None if no route was found. Results are
+    shared between callers, so treat them as read-only.
+    """
+    key = _cache_key(start, end, preference, radiuses, instructions, units)
+    route = _route_cache.get(key)
+    if route is not MISSING:
+        return route
+
+    headers = {
+        'Authorization': settings.OPENROUTESERVICE_API_KEY,
+        'Content-Type': 'application/json',
+    }
+    body = {
+        "coordinates": [
+            [start[1], start[0]],  # [lng, lat]
+            [end[1], end[0]]
+        ],
+        "preference": preference,
+        "units": units,
+        "continue_straight": False,
+        "geometry_simplify": True,
+        "instructions": bool(instructions)
+    }
+    if radiuses:
+        body["radiuses"] = list(radiuses)
+
+    try:
+        response = http_client.post(DIRECTIONS_URL, json=body, headers=headers)
+    except requests.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+
+    data = response.json()
+    if not data.get('routes'):
+        return None
+
+    route = _parse_route(data['routes'][0])
+    _route_cache.set(key, route)
+    return route
+
+
+def directions_cache_stats():
+    return _route_cache.stats()
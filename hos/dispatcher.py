@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import os
+import threading
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from hos import outbox
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """
+    Sends channel layer messages from a bounded queue on an event loop of its own, so
+    requests only pay for a queue append. Under ASGI it runs on the server's loop (see
+    bind_server_loop), where the consumers and the in-memory layer's queues live;
+    otherwise it starts a daemon thread with its own loop.
+
+    Messages recorded in the outbox are marked delivered once sent. Ones that are
+    dropped because the queue is full, or fail to send, stay pending for relay_outbox.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.queue = None
+        self.pid = None
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def send(self, group, message, event_id=None):
+        """Queue a group_send, for the outbox event event_id if given; safe to call from any thread"""
+        loop = self._get_loop()
+        try:
+            loop.call_soon_threadsafe(self._put, group, message, event_id)
+        except RuntimeError:
+            # The loop was closed under us (e.g. interpreter shutdown)
+            logger.warning('Notification dispatcher stopped, dropped %s message', message.get('type'))
+
+    def attach(self, loop):
+        """Run on the given loop from now on; called from inside that loop"""
+        if self.loop is loop and self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.loop is not loop or self.pid != os.getpid():
+                self._start(loop)
+
+    def _get_loop(self):
+        loop = self.loop
+        if loop is None or loop.is_closed() or self.pid != os.getpid():
+            with self.lock:
+                loop = self.loop
+                if loop is None or loop.is_closed() or self.pid != os.getpid():
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name='hos-notifications', daemon=True).start()
+                    self._start(loop)
+        return loop
+
+    def _start(self, loop):
+        self.loop, self.pid = loop, os.getpid()
+        # Scheduled before any message the new loop is handed, so the queue exists first
+        loop.call_soon_threadsafe(self._start_worker, loop)
+
+    def _start_worker(self, loop):
+        self.queue = asyncio.Queue(maxsize=getattr(settings, 'NOTIFICATION_QUEUE_SIZE', 1000))
+        loop.create_task(self._drain(self.queue))
+
+    def _put(self, group, message, event_id):
+        try:
+            self.queue.put_nowait((group, message, event_id))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 100 == 0:
+                logger.warning('Notification queue full, %s messages dropped so far', self.dropped)
+
+    async def _drain(self, queue):
+        timeout = getattr(settings, 'NOTIFICATION_SEND_TIMEOUT', 5)
+        channel_layer = get_channel_layer()
+        delivered = []
+        while True:
+            group, message, event_id = await queue.get()
+            try:
+                # A stalled broker holds up notifications, never requests
+                await asyncio.wait_for(channel_layer.group_send(group, message), timeout)
+            except Exception:
+                # Left pending in the outbox for the relay
+                logger.exception('Failed to send %s to %s', message.get('type'), group)
+            else:
+                if event_id is not None:
+                    delivered.append(event_id)
+
+            # Mark delivered in one update per burst
+            if delivered and (queue.empty() or len(delivered) >= 100):
+                try:
+                    await database_sync_to_async(outbox.mark_delivered)(delivered)
+                except Exception:
+                    # The relay will send these again; deltas are versioned, so that's harmless
+                    logger.exception('Failed to mark %s outbox events delivered', len(delivered))
+                delivered = []
+
+
+dispatcher = NotificationDispatcher()
+
+
+def bind_server_loop(application):
+    """Wrap the ASGI application so notifications are sent from the server's event loop"""
+    async def app(scope, receive, send):
+        dispatcher.attach(asyncio.get_running_loop())
+        return await application(scope, receive, send)
+    return app
@@ -0,0 +1,178 @@
+import re
+import threading
+import time
+from datetime import timedelta
+import requests
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+from hos import http_client
+from hos.cache import LRUCache, MISSING
+from hos.models import GeocodeCache
+
+NOMINATIM_SEARCH_URL = "https://nominatim.openstreetmap.org/search"
+
+GEOCODE_CACHE_TTL = getattr(settings, 'GEOCODE_CACHE_TTL', timedelta(days=30))
+GEOCODE_NEGATIVE_CACHE_TTL = getattr(settings, 'GEOCODE_NEGATIVE_CACHE_TTL', timedelta(days=1))
+
+# Nominatim's usage policy allows at most one request per second
+NOMINATIM_MIN_INTERVAL = getattr(settings, 'NOMINATIM_MIN_INTERVAL', 1.0)
+
+# First tier: per-process LRU. Second tier: the shared GeocodeCache table.
+_memory_cache = LRUCache(maxsize=getattr(settings, 'GEOCODE_CACHE_SIZE', 2048))
+_stats_lock = threading.Lock()
+_stats = {'db_hits': 0, 'network_lookups': 0}
+_nominatim_lock = threading.Lock()
+_nominatim_next_request = 0.0
+
+
+def normalize_address(address):
+    """Normalize an address string into a cache key"""
+    key = re.sub(r'\s+', ' ', str(address)).strip().lower()
+    key = re.sub(r'\s*,\s*', ', ', key)
+    return key.strip(' ,.')
+
+
+def geocode_cache_stats():
+    """Return hit/miss counters for both cache tiers"""
+    memory = _memory_cache.stats()
+    with _stats_lock:
+        return {
+            'memory_hits': memory['hits'],
+            'memory_misses': memory['misses'],
+            'memory_size': memory['size'],
+            'db_hits': _stats['db_hits'],
+            'network_lookups': _stats['network_lookups'],
+        }
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _remember(key, coords, expires_at):
+    ttl = (expires_at - timezone.now()).total_seconds()
+    if ttl > 0:
+        _memory_cache.set(key, coords, ttl=ttl)
+
+
+def _lookup_db(key):
+    try:
+        entry = GeocodeCache.objects.filter(query=key, expires_at__gt=timezone.now()).first()
+    except DatabaseError:
+        return MISSING
+    if entry is None:
+        return MISSING
+    _count('db_hits')
+    coords = (entry.latitude, entry.longitude) if entry.latitude is not None else None
+    _remember(key, coords, entry.expires_at)
+    return coords
+
+
+def _store(key, coords):
+    expires_at = timezone.now() + (GEOCODE_CACHE_TTL if coords else GEOCODE_NEGATIVE_CACHE_TTL)
+    _remember(key, coords, expires_at)
+    if len(key) > GeocodeCache._meta.get_field('query').max_length:
+        return
+    try:
+        GeocodeCache.objects.update_or_create(
+            query=key,
+            defaults={
+                'latitude': coords[0] if coords else None,
+                'longitude': coords[1] if coords else None,
+                'expires_at': expires_at,
+            }
+        )
+    except DatabaseError:
+        pass
+
+
+def wait_for_nominatim():
+    """Block until this process may send its next Nominatim request"""
+    global _nominatim_next_request
+    with _nominatim_lock:
+        now = time.monotonic()
+        wait = _nominatim_next_request - now
+        # Reserve the slot, then sleep outside the lock so callers queue up in order
+        _nominatim_next_request = max(now, _nominatim_next_request) + NOMINATIM_MIN_INTERVAL
+    if wait > 0:
+        time.sleep(wait)
+
+
+def _fetch(address):
+    """Query Nominatim; returns (found, coords) where found is False on a transport/API error"""
+    params = {
+        'q': address,
+        'format': 'json',
+        'limit': 1
+    }
+    wait_for_nominatim()
+    try:
+        response = http_client.get(NOMINATIM_SEARCH_URL, params=params, headers={'User-Agent': 'your-app-name'})
+    except requests.RequestException:
+        return False, None
+
+    if response.status_code != 200:
+        return False, None
+    data = response.json()
+    if data:
+        return True, (float(data[0]['lat']), float(data[0]['lon']))
+    return True, None
+
+
+def cached_geocode(address):
+    """Resolve an address from the memory and database caches only; MISSING if neither has it"""
+    key = normalize_address(address)
+    if not key:
+        return None
+
+    coords = _memory_cache.get(key)
+    if coords is MISSING:
+        coords = _lookup_db(key)
+    return coords
+
+
+def cached_geocodes(addresses):
+    """
+    Resolve many addresses from the caches only, with one database query for all the
+    memory misses. Returns {address: coords}, with MISSING for addresses neither has.
+    """
+    results, pending = {}, {}
+    for address in addresses:
+        key = normalize_address(address)
+        coords = _memory_cache.get(key) if key else None
+        if coords is MISSING:
+            pending.setdefault(key, []).append(address)
+        results[address] = coords
+
+    if pending:
+        try:
+            entries = list(GeocodeCache.objects.filter(query__in=list(pending), expires_at__gt=timezone.now()))
+        except DatabaseError:
+            entries = []
+        for entry in entries:
+            _count('db_hits')
+            coords = (entry.latitude, entry.longitude) if entry.latitude is not None else None
+            _remember(entry.query, coords, entry.expires_at)
+            for address in pending[entry.query]:
+                results[address] = coords
+    return results
+
+
+def geocode_location(address):
+    """Resolve an address to (lat, lon), going through the memory and database caches first"""
+    coords = cached_geocode(address)
+    if coords is not MISSING:
+        return coords
+    return geocode_uncached(address)
+
+
+def geocode_uncached(address):
+    """Look an address up on Nominatim and cache the result; for callers that checked the caches already"""
+    _count('network_lookups')
+    ok, coords = _fetch(address)
+    if ok:
+        # Empty results are cached too, with a shorter TTL
+        _store(normalize_address(address), coords)
+    return coords
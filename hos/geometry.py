@@ -0,0 +1,113 @@
+import math
+import numpy as np
+
+EARTH_RADIUS_MILES = 3959
+EARTH_RADIUS_METERS = 6371008.8
+
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    """Calculate distance between two points in miles using the Haversine formula"""
+    lat1, lon1, lat2, lon2 = map(math.radians, [float(lat1), float(lon1), float(lat2), float(lon2)])
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
+    return EARTH_RADIUS_MILES * 2 * math.asin(math.sqrt(a))
+
+
+def as_points(coordinates):
+    """Return [lat, lng] pairs as an (n, 2) float array"""
+    return np.asarray(coordinates, dtype=float).reshape(-1, 2)
+
+
+def segment_lengths(points):
+    """Haversine length in miles of every segment of an (n, 2) [lat, lng] array"""
+    lat, lon = np.radians(points[:, 0]), np.radians(points[:, 1])
+    a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    return EARTH_RADIUS_MILES * 2 * np.arcsin(np.sqrt(a))
+
+
+def cumulative_distances(points):
+    """Distance in miles from the first point to every point along the line"""
+    cumulative = np.zeros(len(points))
+    if len(points) > 1:
+        np.cumsum(segment_lengths(points), out=cumulative[1:])
+    return cumulative
+
+
+def points_at_offsets(cumulative, offsets):
+    """Index of the segment start point for each mile offset along the line"""
+    # The first point at or beyond an offset ends the segment that crosses it
+    indices = np.searchsorted(cumulative, offsets, side='left') - 1
+    return np.clip(indices, 0, max(len(cumulative) - 2, 0))
+
+
+def index_window(cumulative, index, max_points, max_distance):
+    """Indices within max_points positions and max_distance miles of the point at index"""
+    start = max(index - max_points, int(np.searchsorted(cumulative, cumulative[index] - max_distance, side='left')))
+    end = min(index + max_points, int(np.searchsorted(cumulative, cumulative[index] + max_distance, side='right')) - 1)
+    return range(start, end + 1)
+
+
+def dedupe_consecutive(points):
+    """Drop points that repeat the previous point"""
+    if len(points) < 2:
+        return points
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:] = np.any(np.diff(points, axis=0) != 0, axis=1)
+    return points[keep]
+
+
+def meters_per_pixel(latitude, zoom):
+    """Ground resolution of a 256px web mercator tile at the given latitude and zoom level"""
+    return 156543.03392 * math.cos(math.radians(latitude)) / (2 ** zoom)
+
+
+def project_meters(points):
+    """Project [lat, lng] points onto a local equirectangular plane in meters"""
+    lat, lon = np.radians(points[:, 0]), np.radians(points[:, 1])
+    x = lon * math.cos(float(np.mean(lat))) * EARTH_RADIUS_METERS
+    y = lat * EARTH_RADIUS_METERS
+    return np.column_stack((x, y))
+
+
+def simplify(points, tolerance_meters, anchors=()):
+    """
+    Douglas-Peucker simplification of [lat, lng] points; returns the indices of the points
+    to keep. Indices in anchors are always kept, and the line is simplified between them.
+    """
+    n = len(points)
+    if n < 3 or tolerance_meters <= 0:
+        return np.arange(n)
+
+    xy = project_meters(points)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    anchors = np.asarray(anchors, dtype=int)
+    keep[anchors[(anchors >= 0) & (anchors < n)]] = True
+    fixed = np.flatnonzero(keep)
+    stack = list(zip(fixed[:-1].tolist(), fixed[1:].tolist()))
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = xy[start], xy[end]
+        ab = b - a
+        inner = xy[start + 1:end] - a
+        length_sq = ab @ ab
+        if length_sq:
+            t = np.clip((inner @ ab) / length_sq, 0, 1)
+            inner = inner - t[:, None] * ab
+        distances = np.hypot(inner[:, 0], inner[:, 1])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_meters:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return np.flatnonzero(keep)
+
+
+def remap_indices(kept, indices):
+    """Position in kept of each index into the full line; pass the indices to simplify as anchors"""
+    return np.searchsorted(kept, indices, side='left')
@@ -0,0 +1,102 @@
+import os
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+# Hosts that get their own connection pool (and optionally their own read timeout)
+GEO_SERVICE_HOSTS = [
+    'nominatim.openstreetmap.org',
+    'api.openrouteservice.org',
+    'overpass-api.de',
+]
+
+CONNECT_TIMEOUT = getattr(settings, 'OUTBOUND_HTTP_CONNECT_TIMEOUT', 3.05)
+READ_TIMEOUT = getattr(settings, 'OUTBOUND_HTTP_READ_TIMEOUT', 10)
+HOST_READ_TIMEOUTS = getattr(settings, 'OUTBOUND_HTTP_HOST_READ_TIMEOUTS', {})
+RETRIES = getattr(settings, 'OUTBOUND_HTTP_RETRIES', 2)
+BACKOFF_FACTOR = getattr(settings, 'OUTBOUND_HTTP_BACKOFF_FACTOR', 0.5)
+BACKOFF_MAX = getattr(settings, 'OUTBOUND_HTTP_BACKOFF_MAX', 5)
+POOL_SIZE = getattr(settings, 'OUTBOUND_HTTP_POOL_SIZE', 10)
+
+
+class JitteredRetry(Retry):
+    """Retry policy using "full jitter" exponential backoff"""
+
+    def get_backoff_time(self):
+        attempts = len(self.history)
+        if attempts == 0:
+            return 0
+        ceiling = min(BACKOFF_MAX, self.backoff_factor * (2 ** (attempts - 1)))
+        return random.uniform(0, ceiling)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default (connect, read) timeout to every request"""
+
+    def __init__(self, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def _build_adapter(read_timeout):
+    retry = JitteredRetry(
+        total=RETRIES,
+        connect=RETRIES,
+        read=RETRIES,
+        status=RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=(429, 502, 503, 504),
+        # ORS directions and Overpass queries are POSTs but have no side effects
+        allowed_methods=frozenset({'GET', 'POST'}),
+        raise_on_status=False,
+    )
+    return TimeoutHTTPAdapter(
+        timeout=(CONNECT_TIMEOUT, read_timeout),
+        max_retries=retry,
+        pool_connections=1,
+        pool_maxsize=POOL_SIZE,
+    )
+
+
+def _build_session():
+    session = requests.Session()
+    session.headers['User-Agent'] = 'HOS_App/1.0'
+    default_adapter = _build_adapter(READ_TIMEOUT)
+    session.mount('https://', default_adapter)
+    session.mount('http://', default_adapter)
+    for host in GEO_SERVICE_HOSTS:
+        session.mount(f'https://{host}/', _build_adapter(HOST_READ_TIMEOUTS.get(host, READ_TIMEOUT)))
+    return session
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide keep-alive session, rebuilding it after a fork"""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = _build_session()
+                _session_pid = pid
+    return _session
+
+
+def get(url, **kwargs):
+    return get_session().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return get_session().post(url, **kwargs)
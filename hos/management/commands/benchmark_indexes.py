@@ -0,0 +1,206 @@
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+from hos.models import DrivingLog, Trip
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds large Trip/DrivingLog tables in a throwaway test database, then reports query plans '
+        'and latencies for the hot lookups with and without their indexes. The database is '
+        'created the way the test runner does it and destroyed afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trips', type=int, default=5000, help='Trips to seed')
+        parser.add_argument('--logs-per-trip', type=int, default=40, help='Driving logs to seed per trip')
+        parser.add_argument('--drivers', type=int, default=200, help='Drivers to seed')
+        parser.add_argument('--repeat', type=int, default=50, help='Runs per query when timing')
+        parser.add_argument('--check', action='store_true',
+                            help='Fail if a query does not use its index once the indexes are in place')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Database whose server hosts the throwaway test database')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Replace a leftover test database without asking')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.using = options['database']
+        self.connection = connections[self.using]
+        # Never seed or drop indexes in a live database: DROP INDEX holds an exclusive lock
+        # on the table until the transaction ends
+        test_db_verbosity = max(options['verbosity'] - 1, 0)
+        old_name = self.connection.settings_dict['NAME']
+        self.connection.creation.create_test_db(
+            verbosity=test_db_verbosity, autoclobber=not options['interactive'], serialize=False
+        )
+        try:
+            with transaction.atomic(using=self.using):
+                samples = self.seed()
+                with_indexes = self.measure(samples, 'with indexes')
+                self.drop_indexes()
+                without_indexes = self.measure(samples, 'without indexes')
+                self.report(with_indexes, without_indexes)
+        finally:
+            self.connection.creation.destroy_test_db(old_name, verbosity=test_db_verbosity)
+        self.stdout.write('Test database destroyed')
+
+        if options['check']:
+            missing = [name for name, result in with_indexes.items() if result['uses_index'] is False]
+            if missing:
+                raise CommandError(f"Indexes not used by: {', '.join(missing)}")
+
+    def seed(self):
+        options = self.options
+        rng = random.Random(42)
+        self.stdout.write(
+            f"Seeding {options['drivers']} drivers, {options['trips']} trips and "
+            f"{options['trips'] * options['logs_per_trip']} driving logs..."
+        )
+
+        drivers = User.objects.using(self.using).bulk_create([
+            User(username=f'benchmark-driver-{i}') for i in range(options['drivers'])
+        ])
+        base = timezone.now() - timedelta(days=365)
+        trips = Trip.objects.using(self.using).bulk_create([
+            Trip(
+                driver=None if rng.random() < 0.1 else rng.choice(drivers),
+                pickup_location='Benchmark pickup',
+                dropoff_location='Benchmark dropoff',
+                status=rng.choice(['NOT_STARTED', 'IN_PROGRESS', 'COMPLETED']),
+            )
+            for _ in range(options['trips'])
+        ], batch_size=1000)
+        # created_at is auto_now_add, so spread the history out afterwards
+        for i, trip in enumerate(trips):
+            trip.created_at = base + timedelta(minutes=i)
+        Trip.objects.using(self.using).bulk_update(trips, ['created_at'], batch_size=1000)
+
+        logs = []
+        for trip in trips:
+            start = base + timedelta(hours=rng.randrange(0, 24 * 360))
+            for _ in range(options['logs_per_trip']):
+                end = start + timedelta(minutes=rng.randrange(15, 600))
+                logs.append(DrivingLog(
+                    trip=trip,
+                    status=rng.choice(['OFF', 'SB', 'D', 'ON']),
+                    location='Benchmark',
+                    remarks='Benchmark log',
+                    start_time=start,
+                    end_time=end,
+                    date=timezone.localtime(start).date(),
+                ))
+                start = end
+            if len(logs) >= 10000:
+                DrivingLog.objects.using(self.using).bulk_create(logs)
+                logs = []
+        DrivingLog.objects.using(self.using).bulk_create(logs)
+
+        if self.connection.vendor == 'postgresql':
+            with self.connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Trip._meta.db_table}, {DrivingLog._meta.db_table}')
+        elif self.connection.vendor == 'sqlite':
+            with self.connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        log = DrivingLog.objects.using(self.using).filter(trip=rng.choice(trips)).first()
+        day_start = timezone.make_aware(datetime.combine(log.date, datetime.min.time()))
+        # Halfway through the history, as if a client had paged that far
+        cursor = base + timedelta(minutes=options['trips'] // 2)
+        return {'log': log, 'day_start': day_start, 'driver': rng.choice(drivers), 'cursor': cursor}
+
+    def queries(self, samples):
+        log, day_start, driver = samples['log'], samples['day_start'], samples['driver']
+        logs, trips = DrivingLog.objects.using(self.using), Trip.objects.using(self.using)
+        return {
+            'logs for trip and day': (
+                logs.filter(trip_id=log.trip_id, date=log.date),
+                'drivinglog_trip_date_idx',
+            ),
+            'logs overlapping a day': (
+                logs.filter(
+                    trip_id=log.trip_id,
+                    start_time__lt=day_start + timedelta(days=1),
+                    end_time__gt=day_start,
+                ).order_by(),
+                'drivinglog_trip_start_idx',
+            ),
+            'trips for driver and status': (
+                trips.filter(driver=driver, status='IN_PROGRESS'),
+                'trip_driver_status_idx',
+            ),
+            'trip list page': (
+                trips.filter(created_at__lt=samples['cursor']).order_by('-created_at', '-id')[:50],
+                'trip_created_idx',
+            ),
+            'driver trip list page': (
+                trips.filter(driver=driver, created_at__lt=samples['cursor']).order_by('-created_at', '-id')[:50],
+                'trip_driver_created_idx',
+            ),
+            'available trips page': (
+                trips.filter(
+                    driver__isnull=True, status='NOT_STARTED', created_at__lt=samples['cursor']
+                ).order_by('-created_at', '-id')[:50],
+                # SQLite only matches partial indexes against literal predicates, not bound parameters
+                'trip_available_page_idx' if self.connection.vendor != 'sqlite' else None,
+            ),
+        }
+
+    def explain(self, queryset, phase):
+        # Tag the statement with the phase: sqlite3 caches EXPLAIN statements and would
+        # otherwise report the plan from before the indexes were dropped
+        sql, params = queryset.query.sql_with_params()
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'{self.connection.ops.explain_query_prefix()} {sql} -- {phase}', params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+    def measure(self, samples, phase):
+        results = {}
+        for name, (queryset, index_name) in self.queries(samples).items():
+            plan = self.explain(queryset, phase)
+            # Time the SQL itself, not model instantiation
+            sql, params = queryset.query.sql_with_params()
+            timings = []
+            with self.connection.cursor() as cursor:
+                for run in range(self.options['repeat'] + 1):
+                    started = time.perf_counter()
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                    if run:  # the first run only warms the caches
+                        timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {
+                'plan': plan,
+                'uses_index': index_name in plan if index_name else None,
+                'median_ms': statistics.median(timings),
+                'p95_ms': sorted(timings)[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0],
+            }
+        return results
+
+    def drop_indexes(self):
+        with self.connection.cursor() as cursor:
+            for model in (Trip, DrivingLog):
+                for index in model._meta.indexes:
+                    cursor.execute(f'DROP INDEX {self.connection.ops.quote_name(index.name)}')
+
+    def report(self, with_indexes, without_indexes):
+        for name, after in with_indexes.items():
+            before = without_indexes[name]
+            style = self.style.WARNING if after['uses_index'] is False else self.style.SUCCESS
+            self.stdout.write(style(
+                f"\n{name}: {before['median_ms']:.3f} ms -> {after['median_ms']:.3f} ms median "
+                f"(p95 {before['p95_ms']:.3f} -> {after['p95_ms']:.3f} ms)"
+                f"{'  [index not used]' if after['uses_index'] is False else ''}"
+            ))
+            self.stdout.write('  without indexes:')
+            for line in before['plan'].splitlines():
+                self.stdout.write(f'    {line}')
+            self.stdout.write('  with indexes:')
+            for line in after['plan'].splitlines():
+                self.stdout.write(f'    {line}')
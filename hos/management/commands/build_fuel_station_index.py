@@ -0,0 +1,94 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from hos.stations import StationIndex, load_stations, stations_from_overpass, write_stations
+
+
+def _station(tags, lat, lon):
+    return {
+        'name': tags.get('name', ''),
+        'brand': tags.get('brand', ''),
+        'lat': round(float(lat), 6),
+        'lon': round(float(lon), 6),
+    }
+
+
+def read_osm_json(path):
+    """Overpass JSON (elements) or a GeoJSON FeatureCollection of points"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    yield from stations_from_overpass(data.get('elements', []))
+
+    for feature in data.get('features', []):
+        properties = feature.get('properties') or {}
+        geometry = feature.get('geometry') or {}
+        if properties.get('amenity', 'fuel') == 'fuel' and geometry.get('type') == 'Point':
+            lon, lat = geometry['coordinates'][:2]
+            yield _station(properties, lat, lon)
+
+
+def read_osm_xml(path):
+    """OSM XML extract; nodes, plus ways/relations exported with a <center> element"""
+    for _, element in ET.iterparse(path, events=('end',)):
+        if element.tag not in ('node', 'way', 'relation'):
+            continue
+        tags = {tag.get('k'): tag.get('v') for tag in element.findall('tag')}
+        if tags.get('amenity') == 'fuel':
+            point = element if element.tag == 'node' else element.find('center')
+            if point is not None and point.get('lat') is not None:
+                yield _station(tags, point.get('lat'), point.get('lon'))
+        element.clear()
+
+
+def read_csv(path):
+    for row in load_stations(path):
+        lat = row.get('lat') or row.get('latitude')
+        lon = row.get('lon') or row.get('longitude')
+        if lat and lon:
+            yield _station(row, lat, lon)
+
+
+READERS = {
+    '.json': read_osm_json,
+    '.geojson': read_osm_json,
+    '.osm': read_osm_xml,
+    '.xml': read_osm_xml,
+    '.csv': read_csv,
+}
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the local fuel station index from OSM extracts or CSV files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='+', help='OSM XML (.osm), Overpass/GeoJSON (.json) or CSV files')
+        parser.add_argument('--output', default=getattr(settings, 'FUEL_STATIONS_PATH', None),
+                            help='Where to write the station file (defaults to FUEL_STATIONS_PATH)')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if not output:
+            raise CommandError('No output path given and FUEL_STATIONS_PATH is not set')
+
+        stations = {}
+        for source in options['sources']:
+            reader = READERS.get(os.path.splitext(source)[1].lower())
+            if reader is None:
+                raise CommandError(f'Unsupported source file: {source}')
+            count = 0
+            for station in reader(source):
+                # The same station often appears in overlapping extracts
+                stations[(station['lat'], station['lon'], station['name'])] = station
+                count += 1
+            self.stdout.write(f'{source}: {count} fuel stations')
+
+        rows = sorted(stations.values(), key=lambda s: (s['lat'], s['lon']))
+        StationIndex(rows)  # fail before replacing the current file if a row is unusable
+        tmp_path = f'{output}.tmp'
+        write_stations(tmp_path, rows)
+        os.replace(tmp_path, output)
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(rows)} fuel stations to {output}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from hos.aggregates import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recomputes DailyLogSheet totals from the driving logs (e.g. after bulk edits that bypass signals)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trip', type=int, action='append', dest='trips',
+                            help='Only rebuild this trip (can be repeated)')
+
+    def handle(self, *args, **options):
+        count = rebuild(trip_ids=options['trips'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} daily log sheets'))
@@ -0,0 +1,61 @@
+import asyncio
+import time
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from hos import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        'Publishes outbox events that were not delivered right after their transaction '
+        'committed (e.g. the process crashed or the broker was down), and prunes delivered ones.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Relay and prune once, then exit')
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'OUTBOX_BATCH_SIZE', 500))
+        parser.add_argument('--delay', type=float, default=getattr(settings, 'OUTBOX_RELAY_DELAY', 10),
+                            help='Leave events younger than this many seconds to their dispatcher')
+        parser.add_argument('--poll-interval', type=float, default=1, help='Seconds to wait when nothing is pending')
+        parser.add_argument('--prune-interval', type=float, default=300, help='Seconds between prunes')
+
+    def handle(self, *args, **options):
+        if not outbox.layer_is_shared():
+            raise CommandError(
+                'The channel layer only reaches consumers in this process, so relayed events would be '
+                'lost; set CHANNEL_BROKER_URL to the broker the web workers use'
+            )
+
+        # One loop for the life of the command, so the channel layer keeps its broker connection
+        loop = asyncio.new_event_loop()
+        try:
+            self.relay_forever(loop, options)
+        finally:
+            close = getattr(get_channel_layer(), 'close', None)
+            if close is not None:
+                loop.run_until_complete(close())
+            loop.close()
+
+    def relay_forever(self, loop, options):
+        last_prune = 0
+        while True:
+            close_old_connections()
+            relayed = total = outbox.relay(options['batch_size'], options['delay'], loop=loop)
+            # Drain a backlog batch by batch before sleeping
+            while relayed == options['batch_size']:
+                relayed = outbox.relay(options['batch_size'], options['delay'], loop=loop)
+                total += relayed
+            if total:
+                self.stdout.write(f'Relayed {total} events')
+
+            if options['once'] or time.monotonic() - last_prune >= options['prune_interval']:
+                pruned = outbox.prune()
+                last_prune = time.monotonic()
+                if pruned:
+                    self.stdout.write(f'Pruned {pruned} delivered events')
+
+            if options['once']:
+                return
+            time.sleep(options['poll_interval'])
@@ -0,0 +1,27 @@
+import asyncio
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from hos.channel_layers import DEFAULT_BROKER_URL, ChannelBroker
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the pub/sub broker that relays WebSocket events between the worker processes '
+        'on this host. Point CHANNEL_BROKER_URL at the same address.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=getattr(settings, 'CHANNEL_BROKER_URL', None) or DEFAULT_BROKER_URL,
+                            help='unix:///path/to.sock or redis://host:port to listen on')
+
+    def handle(self, *args, **options):
+        try:
+            asyncio.run(self.serve(options['url']))
+        except KeyboardInterrupt:
+            pass
+
+    async def serve(self, url):
+        server = await ChannelBroker().serve(url)
+        self.stdout.write(self.style.SUCCESS(f'Channel broker listening on {url}'))
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-17 00:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hos', '0008_rebuild_daily_log_totals'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='dailylogsheet',
+            constraint=models.UniqueConstraint(fields=('trip', 'date'), name='unique_daily_log_per_trip_date'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.0.2 on 2026-10-17 00:12
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from django.db import migrations
+from django.utils import timezone
+
+# DrivingLog status -> DailyLogSheet field, as of this migration
+STATUS_FIELDS = {
+    'D': 'driving_hours',
+    'ON': 'on_duty_hours',
+    'OFF': 'off_duty_hours',
+    'SB': 'sleeper_berth_hours',
+}
+
+
+def day_spans(start_time, end_time, tz):
+    """Split a log period at local midnight into (date, hours) pairs"""
+    start, end = timezone.localtime(start_time, tz), timezone.localtime(end_time, tz)
+    day = start.date()
+    while start < end:
+        next_midnight = timezone.make_aware(datetime.combine(day + timedelta(days=1), datetime.min.time()), tz)
+        stop = min(end, next_midnight)
+        yield day, (stop - start).total_seconds() / 3600
+        day, start = day + timedelta(days=1), stop
+
+
+def rebuild_daily_logs(apps, schema_editor):
+    # DailyLogGenerator used to add a new row on every call, and rows written before the
+    # totals were kept up to date can be stale. Recompute them all from the logs, one row
+    # per trip and day, so the unique constraint can be added and the incremental
+    # updates start from correct totals.
+    DrivingLog = apps.get_model('hos', 'DrivingLog')
+    DailyLogSheet = apps.get_model('hos', 'DailyLogSheet')
+    tz = timezone.get_current_timezone()
+
+    totals = defaultdict(dict)
+    logs = DrivingLog.objects.exclude(end_time=None).filter(status__in=STATUS_FIELDS).order_by()
+    for trip_id, status, start_time, end_time in logs.values_list('trip_id', 'status', 'start_time', 'end_time').iterator():
+        if end_time <= start_time:
+            continue
+        field = STATUS_FIELDS[status]
+        for day, hours in day_spans(start_time, end_time, tz):
+            values = totals[(trip_id, day)]
+            values[field] = values.get(field, 0) + hours
+
+    DailyLogSheet.objects.all().delete()
+    DailyLogSheet.objects.bulk_create(
+        [DailyLogSheet(trip_id=trip_id, date=day, **values) for (trip_id, day), values in totals.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hos', '0007_geocodecache'),
+    ]
+
+    # Runs in its own transaction: PostgreSQL refuses to alter the table while the
+    # inserts' deferred foreign key checks are pending, so the constraint comes next
+    operations = [
+        migrations.RunPython(rebuild_daily_logs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.2 on 2026-10-17 00:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hos', '0008_dailylogsheet_unique_trip_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='drivinglog',
+            index=models.Index(fields=['trip', 'date', 'start_time'], name='drivinglog_trip_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='drivinglog',
+            index=models.Index(fields=['trip', 'start_time'], name='drivinglog_trip_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['driver', 'status'], name='trip_driver_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(condition=models.Q(('driver__isnull', True), ('status', 'NOT_STARTED')), fields=['created_at'], name='trip_available_idx'),
+        ),
+    ]
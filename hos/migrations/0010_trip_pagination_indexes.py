@@ -0,0 +1,31 @@
+# Generated by Django 5.0.2 on 2026-10-17 00:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hos', '0009_trip_and_drivinglog_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='trip',
+            name='trip_available_idx',
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['created_at', 'id'], name='trip_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['driver', 'created_at', 'id'], name='trip_driver_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(condition=models.Q(('driver__isnull', True), ('status', 'NOT_STARTED')), fields=['created_at', 'id'], name='trip_available_page_idx'),
+        ),
+    ]
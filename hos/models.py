@@ -1,6 +1,9 @@
 from django.utils import timezone
 from django.db import models
+from django.db.models import DurationField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Greatest, Least
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 User = get_user_model()
@@ -27,10 +30,54 @@ class Trip(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=TRIP_STATUS_CHOICES, default='NOT_STARTED')
     auto_assign = models.BooleanField(default=False)
+    version = models.PositiveIntegerField(default=0)  # Bumped on every change broadcast to WebSocket clients
+
+    class Meta:
+        indexes = [
+            # Driver trip lists, optionally narrowed by status
+            models.Index(fields=['driver', 'status'], name='trip_driver_status_idx'),
+            # Cursor pagination walks (created_at, id), for all trips and per driver
+            models.Index(fields=['created_at', 'id'], name='trip_created_idx'),
+            models.Index(fields=['driver', 'created_at', 'id'], name='trip_driver_created_idx'),
+            # Available trips: only the unassigned, not started rows are indexed
+            models.Index(
+                fields=['created_at', 'id'],
+                name='trip_available_page_idx',
+                condition=models.Q(driver__isnull=True, status='NOT_STARTED'),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.pickup_location} ➔ {self.dropoff_location} ({self.get_status_display()})"
 
+# DailyLogSheet field holding the hours of each DrivingLog status
+STATUS_TOTAL_FIELDS = {
+    'D': 'driving_hours',
+    'ON': 'on_duty_hours',
+    'OFF': 'off_duty_hours',
+    'SB': 'sleeper_berth_hours',
+}
+
+class DrivingLogQuerySet(models.QuerySet):
+    def daily_totals(self, start=None, end=None):
+        """
+        Hours per status, keyed by DailyLogSheet field, summed in one grouped query.
+        With start and end, only the part of each log inside that period is counted.
+        """
+        logs = self.exclude(end_time=None)
+        log_start, log_end = F('start_time'), F('end_time')
+        if start is not None and end is not None:
+            logs = logs.filter(start_time__lt=end, end_time__gt=start)
+            log_start = Greatest(log_start, Value(start, output_field=models.DateTimeField()))
+            log_end = Least(log_end, Value(end, output_field=models.DateTimeField()))
+
+        duration = ExpressionWrapper(log_end - log_start, output_field=DurationField())
+        totals = dict.fromkeys(STATUS_TOTAL_FIELDS.values(), 0)
+        for status, total in logs.order_by().values('status').annotate(total=Sum(duration)).values_list('status', 'total'):
+            if status in STATUS_TOTAL_FIELDS and total is not None:
+                totals[STATUS_TOTAL_FIELDS[status]] = total.total_seconds() / 3600
+        return totals
+
 class DrivingLog(models.Model):
     STATUS_CHOICES = [
         ('OFF', 'Off Duty'),
@@ -47,8 +94,16 @@ class DrivingLog(models.Model):
     remarks = models.TextField()
     date = models.DateField(default=timezone.now)
 
+    objects = DrivingLogQuerySet.as_manager()
+
     class Meta:
         ordering = ['date', 'start_time']  # <-- ADD THIS
+        indexes = [
+            # A trip's logs for a day, already in the default ordering
+            models.Index(fields=['trip', 'date', 'start_time'], name='drivinglog_trip_date_idx'),
+            # A trip's logs overlapping a time range (daily totals across midnight)
+            models.Index(fields=['trip', 'start_time'], name='drivinglog_trip_start_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_status_display()} at {self.location} on {self.date}"
@@ -66,5 +121,39 @@ class DailyLogSheet(models.Model):
     off_duty_hours = models.FloatField(default=0)
     sleeper_berth_hours = models.FloatField(default=0)
 
+    class Meta:
+        # One row per trip and day, kept up to date as DrivingLogs change (see hos/signals.py)
+        constraints = [
+            models.UniqueConstraint(fields=['trip', 'date'], name='unique_daily_log_per_trip_date'),
+        ]
+
     def __str__(self):
         return f"Log for {self.date}"
+
+
+class GeocodeCache(models.Model):
+    query = models.CharField(max_length=255, unique=True)  # normalized address
+    latitude = models.FloatField(null=True, blank=True)  # null for cached "no result"
+    longitude = models.FloatField(null=True, blank=True)
+    expires_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.query} ➔ ({self.latitude}, {self.longitude})"
+
+
+class OutboxEvent(models.Model):
+    group = models.CharField(max_length=100)  # channel layer group the payload is sent to
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The relay only ever scans undelivered rows, oldest first
+            models.Index(fields=['id'], condition=models.Q(delivered_at__isnull=True), name='outbox_pending_idx'),
+            models.Index(fields=['delivered_at'], name='outbox_delivered_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.payload.get('type')} ➔ {self.group} ({'delivered' if self.delivered_at else 'pending'})"
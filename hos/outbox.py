@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from hos.channel_layers import BrokerChannelLayer
+from hos.models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+
+def record(group, message):
+    """Write a channel layer message to the outbox, in the caller's transaction"""
+    return OutboxEvent.objects.create(group=group, payload=message)
+
+
+def mark_delivered(event_ids):
+    return OutboxEvent.objects.filter(id__in=event_ids, delivered_at=None).update(delivered_at=timezone.now())
+
+
+def layer_is_shared(channel_layer=None):
+    """Whether group_send on the channel layer reaches consumers in other processes"""
+    channel_layer = channel_layer or get_channel_layer()
+    # The in-memory layer only reaches this process; BrokerChannelLayer extends it to all of them
+    return not isinstance(channel_layer, InMemoryChannelLayer) or isinstance(channel_layer, BrokerChannelLayer)
+
+
+async def publish(events):
+    """Send the events in order; returns the ones sent before the first failure"""
+    channel_layer = get_channel_layer()
+    timeout = getattr(settings, 'NOTIFICATION_SEND_TIMEOUT', 5)
+    sent = []
+    for event in events:
+        try:
+            # The batch's rows stay locked until we return, so a stalled broker can't hold them forever
+            await asyncio.wait_for(channel_layer.group_send(event.group, event.payload), timeout)
+        except Exception:
+            logger.exception('Failed to relay %s to %s', event.payload.get('type'), event.group)
+            break
+        sent.append(event)
+    return sent
+
+
+def relay(batch_size=None, delay=None, loop=None):
+    """
+    Publish one batch of undelivered events, oldest first, and mark them delivered.
+    Returns the number relayed; a send that fails or times out ends the batch early.
+    Pass a long-lived event loop to keep one broker connection across batches; without
+    one, each batch runs on a throwaway loop and connection.
+
+    Events younger than delay seconds are left to the dispatcher of the process that
+    wrote them. Rows are claimed with SKIP LOCKED, so several relays can run at once.
+    Delivery is at least once: a relay that dies mid-batch leaves its rows pending.
+
+    Raises ImproperlyConfigured when the channel layer is in-memory: the relay runs in a
+    process of its own, so its sends would reach no consumer yet mark the events delivered.
+    """
+    if not layer_is_shared():
+        raise ImproperlyConfigured('Relaying the outbox needs a channel layer shared between processes; set CHANNEL_BROKER_URL')
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 500)
+    delay = getattr(settings, 'OUTBOX_RELAY_DELAY', 10) if delay is None else delay
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(delivered_at=None, created_at__lte=timezone.now() - timedelta(seconds=delay))
+            .order_by('id')[:batch_size]
+        )
+        if events:
+            # One event loop hop for the whole batch
+            events = loop.run_until_complete(publish(events)) if loop else async_to_sync(publish)(events)
+            mark_delivered([event.id for event in events])
+    return len(events)
+
+
+def prune(retention_hours=None, chunk_size=10000):
+    """Delete delivered events older than the retention period; returns the number deleted"""
+    retention_hours = retention_hours if retention_hours is not None else getattr(settings, 'OUTBOX_RETENTION_HOURS', 24)
+    cutoff = timezone.now() - timedelta(hours=retention_hours)
+    deleted = 0
+    while True:
+        # Chunked, so pruning a large backlog doesn't hold one long delete
+        ids = list(OutboxEvent.objects.filter(delivered_at__lt=cutoff).values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        deleted += OutboxEvent.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,13 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class TripCursorPagination(CursorPagination):
+    """
+    Keyset pagination over trips, newest first. Pages are fetched with
+    WHERE created_at < cursor instead of OFFSET, so deep pages cost the same as the first.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = getattr(settings, 'TRIP_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'TRIP_MAX_PAGE_SIZE', 200)
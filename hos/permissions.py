@@ -1,28 +1,26 @@
 from rest_framework import permissions
+from hos import roles
 
 class IsAdminOrSupervisor(permissions.BasePermission):
     """
     Custom permission to only allow admins or supervisors to access the view.
     """
     def has_permission(self, request, view):
-        return request.user.is_authenticated and (
-            request.user.is_staff or 
-            request.user.groups.filter(name='supervisors').exists()
-        )
+        return roles.is_admin_or_supervisor(request.user)
 
 class IsDriver(permissions.BasePermission):
     """
     Custom permission to only allow drivers to access the view.
     """
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.groups.filter(name='drivers').exists()
+        return request.user.is_authenticated and roles.is_driver(request.user)
 
 class IsTripDriver(permissions.BasePermission):
     """
     Custom permission to only allow the driver assigned to a trip to access it.
     """
     def has_object_permission(self, request, view, obj):
-        return request.user.is_authenticated and obj.driver == request.user
+        return request.user.is_authenticated and obj.driver_id == request.user.id
 
 class IsTripDriverOrAdmin(permissions.BasePermission):
     """
@@ -34,19 +32,19 @@ class IsTripDriverOrAdmin(permissions.BasePermission):
             return False
         
         # Admin and supervisors can access any trip
-        if request.user.is_staff or request.user.groups.filter(name='supervisors').exists():
+        if roles.is_admin_or_supervisor(request.user):
             return True
         
         # Drivers can access the view
-        return request.user.groups.filter(name='drivers').exists()
+        return roles.is_driver(request.user)
     
     def has_object_permission(self, request, view, obj):
         # Admin and supervisors can access any trip
-        if request.user.is_staff or request.user.groups.filter(name='supervisors').exists():
+        if roles.is_admin_or_supervisor(request.user):
             return True
         
         # Drivers can only access their own trips
-        return obj.driver == request.user 
+        return obj.driver_id == request.user.id 
 
 class TripPermission(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -55,10 +53,6 @@ class TripPermission(permissions.BasePermission):
             
         if request.method == 'POST':
             # Check if user is in any of the allowed groups
-            return (
-                request.user.groups.filter(name='drivers').exists() or
-                request.user.groups.filter(name='supervisors').exists() or
-                request.user.is_staff
-            )
+            return roles.is_admin_or_supervisor(request.user) or roles.is_driver(request.user)
             
         return True 
\ No newline at end of file
@@ -0,0 +1,174 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+MAX_DRIVING_HOURS = 11
+MAX_DUTY_WINDOW_HOURS = 14
+MAX_CYCLE_HOURS = 70
+CYCLE_DAYS = 8
+DRIVING_BEFORE_BREAK_HOURS = 8
+BREAK_HOURS = 0.5
+RESET_HOURS = 10
+RESTART_HOURS = 34
+
+DRIVING_SPEED = 60  # Average speed in mph
+FUEL_STOP_DISTANCE = 1000  # Miles between fuel stops
+FUEL_STOP_HOURS = 0.5
+PICKUP_HOURS = 1
+DROPOFF_HOURS = 1
+
+EPSILON = 1e-9
+
+# status, start and end of one duty period; activity is one of the ACTIVITIES keys
+Interval = namedtuple('Interval', ['status', 'start', 'end', 'activity'])
+
+ACTIVITIES = {
+    'pickup': 'Pickup',
+    'drive': 'Driving',
+    'break': '30-minute break',
+    'fuel': 'Fuel stop',
+    'reset': '10-hour reset',
+    'restart': '34-hour restart',
+    'dropoff': 'Dropoff',
+    'off': 'Off duty',
+}
+
+
+def plan_trip(start, driving_hours=None, distance_miles=None, current_cycle_used=0,
+              average_speed=DRIVING_SPEED, fuel_stop_distance=FUEL_STOP_DISTANCE,
+              pickup_hours=PICKUP_HOURS, dropoff_hours=DROPOFF_HOURS):
+    """
+    Plan a trip of driving_hours (or distance_miles at average_speed) starting at start.
+
+    The driver is assumed to start fresh after a 10-hour rest with current_cycle_used
+    hours already counted against the 70-hour cycle. Cycle hours are not rolled off
+    during the trip, which keeps long plans on the conservative side. Returns a list
+    of Intervals, back to back from start.
+    """
+    if driving_hours is None:
+        if distance_miles is None:
+            raise ValueError("Either driving_hours or distance_miles is required")
+        driving_hours = distance_miles / average_speed
+    if distance_miles is None:
+        distance_miles = driving_hours * average_speed
+    # Hours of driving between fuel stops at this trip's pace
+    fuel_every = fuel_stop_distance / (distance_miles / driving_hours) if distance_miles and driving_hours and fuel_stop_distance else None
+
+    offsets = []  # (status, start offset, end offset, activity)
+    now = 0.0
+    shift_start = None  # offset when the current 14-hour window opened
+    shift_driving = 0.0
+    since_break = 0.0
+    cycle = float(current_cycle_used or 0)
+    until_fuel = fuel_every
+
+    def add(status, hours, activity):
+        nonlocal now, shift_start, shift_driving, since_break, cycle
+        offsets.append((status, now, now + hours, activity))
+        if status in ('D', 'ON'):
+            if shift_start is None:
+                shift_start = now
+            cycle += hours
+            if status == 'D':
+                shift_driving += hours
+                since_break += hours
+        if status != 'D' and hours >= BREAK_HOURS - EPSILON:
+            since_break = 0.0
+        if status in ('OFF', 'SB') and hours >= RESET_HOURS - EPSILON:
+            shift_start, shift_driving = None, 0.0
+            if hours >= RESTART_HOURS - EPSILON:
+                cycle = 0.0
+        now += hours
+
+    if pickup_hours:
+        add('ON', pickup_hours, 'pickup')
+
+    remaining = driving_hours
+    while remaining > EPSILON:
+        window_left = MAX_DUTY_WINDOW_HOURS - (now - shift_start) if shift_start is not None else MAX_DUTY_WINDOW_HOURS
+        if MAX_CYCLE_HOURS - cycle <= EPSILON:
+            add('OFF', RESTART_HOURS, 'restart')
+        elif MAX_DRIVING_HOURS - shift_driving <= EPSILON or window_left <= EPSILON:
+            add('SB', RESET_HOURS, 'reset')
+        elif until_fuel is not None and until_fuel <= EPSILON:
+            # A fuel stop of 30 minutes or more also counts as the driver's break
+            add('ON', FUEL_STOP_HOURS, 'fuel')
+            until_fuel = fuel_every
+        elif DRIVING_BEFORE_BREAK_HOURS - since_break <= EPSILON:
+            add('OFF', BREAK_HOURS, 'break')
+        else:
+            hours = min(
+                remaining,
+                MAX_DRIVING_HOURS - shift_driving,
+                window_left,
+                DRIVING_BEFORE_BREAK_HOURS - since_break,
+                MAX_CYCLE_HOURS - cycle,
+                until_fuel if until_fuel is not None else remaining,
+            )
+            add('D', hours, 'drive')
+            remaining -= hours
+            if until_fuel is not None:
+                until_fuel -= hours
+
+    if dropoff_hours:
+        add('ON', dropoff_hours, 'dropoff')
+
+    return [Interval(status, start + timedelta(hours=a), start + timedelta(hours=b), activity)
+            for status, a, b, activity in offsets]
+
+
+def split_days(intervals, pad=True):
+    """
+    Split intervals at midnight into [(date, intervals)] in calendar order.
+
+    With pad, the first day is filled with off duty time from midnight until the plan
+    starts and the last day from the end of the plan until midnight, so every day
+    covers 24 hours.
+    """
+    days = []
+    if not intervals:
+        return days
+    tzinfo = intervals[0].start.tzinfo
+
+    def midnight(day):
+        return datetime.combine(day, datetime.min.time(), tzinfo=tzinfo)
+
+    day = intervals[0].start.date()
+    current = []
+    if pad and intervals[0].start > midnight(day):
+        current.append(Interval('OFF', midnight(day), intervals[0].start, 'off'))
+
+    for interval in intervals:
+        start = interval.start
+        while True:
+            next_midnight = midnight(day + timedelta(days=1))
+            if interval.end <= next_midnight:
+                if interval.end > start:
+                    current.append(interval._replace(start=start))
+                break
+            if next_midnight > start:
+                current.append(interval._replace(start=start, end=next_midnight))
+            days.append((day, current))
+            day, current, start = day + timedelta(days=1), [], next_midnight
+
+    end = intervals[-1].end
+    if pad and end < midnight(day + timedelta(days=1)):
+        current.append(Interval('OFF', end, midnight(day + timedelta(days=1)), 'off'))
+    if current:
+        days.append((day, current))
+    return days
+
+
+def hours_by_status(intervals):
+    """Total hours per duty status"""
+    hours = {'OFF': 0, 'SB': 0, 'D': 0, 'ON': 0}
+    for interval in intervals:
+        hours[interval.status] += (interval.end - interval.start).total_seconds() / 3600
+    return hours
+
+
+def hours_by_activity(intervals):
+    """Total hours per activity"""
+    hours = dict.fromkeys(ACTIVITIES, 0)
+    for interval in intervals:
+        hours[interval.activity] += (interval.end - interval.start).total_seconds() / 3600
+    return hours
@@ -0,0 +1,35 @@
+DRIVERS = 'drivers'
+SUPERVISORS = 'supervisors'
+
+# Attribute the group names are memoized under; the user object lives for one request
+CACHE_ATTR = '_hos_group_names'
+
+
+def group_names(user):
+    """Names of the user's groups, loaded with one query and memoized on the user"""
+    if not user or not user.is_authenticated:
+        return frozenset()
+    names = getattr(user, CACHE_ATTR, None)
+    if names is None:
+        names = frozenset(user.groups.values_list('name', flat=True))
+        setattr(user, CACHE_ATTR, names)
+    return names
+
+
+def is_driver(user):
+    return DRIVERS in group_names(user)
+
+
+def is_supervisor(user):
+    return SUPERVISORS in group_names(user)
+
+
+def is_admin_or_supervisor(user):
+    return bool(user and user.is_authenticated and (user.is_staff or is_supervisor(user)))
+
+
+def get_role(user):
+    """'admin', 'supervisor' or 'driver', as reported to clients"""
+    if user.is_staff:
+        return 'admin'
+    return 'supervisor' if is_supervisor(user) else 'driver'
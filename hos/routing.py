@@ -4,4 +4,5 @@ from . import consumers
 websocket_urlpatterns = [
     re_path(r'ws/trips/(?P<trip_id>\d+)/$', consumers.TripConsumer.as_asgi()),
     re_path(r'ws/trips/$', consumers.TripsConsumer.as_asgi()),
+    re_path(r'ws/trips/(?P<trip_id>\d+)/logs/$', consumers.LogConsumer.as_asgi()),
 ] 
\ No newline at end of file
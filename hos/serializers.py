@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.conf import settings
 from .models import Trip, DrivingLog, DailyLogSheet
 from django.contrib.auth import get_user_model
 
@@ -32,9 +33,9 @@ class TripSerializer(serializers.ModelSerializer):
             'total_distance', 'estimated_driving_time',
             'created_at', 'status', 'driver', 'logs',
             'daily_logs', 'auto_assign', 'pickup_coordinates',
-            'dropoff_coordinates'
+            'dropoff_coordinates', 'version'
         ]
-        read_only_fields = ['driver', 'status']
+        read_only_fields = ['driver', 'status', 'version']
         extra_kwargs = {
             'driver': {'required': False},  # Make driver optional
             'current_cycle_used': {'required': False},  # Also optional
@@ -42,7 +43,48 @@ class TripSerializer(serializers.ModelSerializer):
             'dropoff_coordinates': {'required': False}  # Optional
         }
 
+class TripSummarySerializer(serializers.ModelSerializer):
+    """Trip without its nested logs, for list endpoints"""
+    driver = UserSerializer(read_only=True)
+
+    class Meta:
+        model = Trip
+        fields = [
+            'id', 'pickup_location', 'dropoff_location',
+            'current_location', 'current_cycle_used',
+            'total_distance', 'estimated_driving_time',
+            'created_at', 'status', 'driver', 'auto_assign',
+            'pickup_coordinates', 'dropoff_coordinates', 'version'
+        ]
+
 class SimplifiedTripSerializer(serializers.ModelSerializer):
     class Meta:
         model = Trip
-        fields = ['id', 'status', 'pickup_location', 'dropoff_location', 'created_at']
\ No newline at end of file
+        fields = ['id', 'status', 'pickup_location', 'dropoff_location', 'created_at']
+
+class BatchLoadSerializer(serializers.Serializer):
+    reference = serializers.CharField(max_length=100, required=False)
+    pickup_location = serializers.CharField(max_length=255, required=False)
+    dropoff_location = serializers.CharField(max_length=255, required=False)
+    pickup_coordinates = serializers.ListField(child=serializers.FloatField(), min_length=2, max_length=2, required=False)
+    dropoff_coordinates = serializers.ListField(child=serializers.FloatField(), min_length=2, max_length=2, required=False)
+    current_cycle_used = serializers.FloatField(min_value=0, max_value=70, default=0)
+
+    def validate(self, data):
+        for end in ('pickup', 'dropoff'):
+            if not (data.get(f'{end}_coordinates') or data.get(f'{end}_location')):
+                raise serializers.ValidationError(f"Either {end}_location or {end}_coordinates is required")
+        return data
+
+class BatchPlanSerializer(serializers.Serializer):
+    loads = BatchLoadSerializer(many=True)
+    start_time = serializers.DateTimeField(required=False)
+    include_schedule = serializers.BooleanField(default=False)
+
+    def validate_loads(self, loads):
+        max_loads = getattr(settings, 'BATCH_PLANNING_MAX_LOADS', 500)
+        if not loads:
+            raise serializers.ValidationError("At least one load is required")
+        if len(loads) > max_loads:
+            raise serializers.ValidationError(f"At most {max_loads} loads can be planned at once")
+        return loads
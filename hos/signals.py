@@ -0,0 +1,34 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from hos import aggregates
+from hos.models import DrivingLog
+
+
+@receiver(pre_save, sender=DrivingLog)
+def remember_previous_log(sender, instance, raw=False, **kwargs):
+    """Keep the stored version of an updated log so its old hours can be taken back out"""
+    instance._previous_log = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._previous_log = DrivingLog.objects.filter(pk=instance.pk).values_list(
+        'trip_id', 'status', 'start_time', 'end_time'
+    ).first()
+
+
+@receiver(post_save, sender=DrivingLog)
+def update_daily_totals(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = aggregates.new_deltas()
+    previous = getattr(instance, '_previous_log', None)
+    if previous:
+        aggregates.add_log(deltas, *previous, sign=-1)
+    aggregates.add_log(deltas, instance.trip_id, instance.status, instance.start_time, instance.end_time)
+    aggregates.apply_deltas(deltas)
+    instance._previous_log = None
+
+
+@receiver(post_delete, sender=DrivingLog)
+def remove_daily_totals(sender, instance, **kwargs):
+    aggregates.apply_logs([instance], sign=-1)
+
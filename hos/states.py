@@ -0,0 +1,119 @@
+import json
+import math
+import os
+import threading
+
+STATES_DATA_PATH = os.path.join(os.path.dirname(__file__), 'data', 'us_states.json')
+
+
+class StateResolver:
+    """
+    Offline point-in-polygon lookup of US state codes.
+
+    A coarse grid maps each cell to the states whose bounding box covers it, and
+    every state's edges are bucketed into latitude slabs, so a ray-casting test
+    only looks at the handful of edges that cross the query latitude.
+    """
+
+    def __init__(self, states, cell_size=1.0, slab_size=0.1):
+        self.cell_size = cell_size
+        self.slab_size = slab_size
+        self._grid = {}
+        self._slabs = {}
+
+        for code, rings in states.items():
+            slabs = {}
+            min_lon = min_lat = math.inf
+            max_lon = max_lat = -math.inf
+            for ring in rings:
+                for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+                    if y1 == y2:
+                        continue  # horizontal edges never cross a horizontal ray
+                    edge = (x1, y1, x2, y2)
+                    for slab in range(self._slab(min(y1, y2)), self._slab(max(y1, y2)) + 1):
+                        slabs.setdefault(slab, []).append(edge)
+                min_lon = min(min_lon, *(p[0] for p in ring))
+                max_lon = max(max_lon, *(p[0] for p in ring))
+                min_lat = min(min_lat, *(p[1] for p in ring))
+                max_lat = max(max_lat, *(p[1] for p in ring))
+            self._slabs[code] = slabs
+
+            for cell_x in range(self._cell(min_lon), self._cell(max_lon) + 1):
+                for cell_y in range(self._cell(min_lat), self._cell(max_lat) + 1):
+                    self._grid.setdefault((cell_x, cell_y), []).append(code)
+
+    @classmethod
+    def from_file(cls, path=STATES_DATA_PATH):
+        with open(path) as f:
+            return cls(json.load(f)['states'])
+
+    def _cell(self, value):
+        return math.floor(value / self.cell_size)
+
+    def _slab(self, lat):
+        return math.floor(lat / self.slab_size)
+
+    def contains(self, code, lat, lon):
+        """Even-odd ray casting against the edges in the point's latitude slab"""
+        inside = False
+        for x1, y1, x2, y2 in self._slabs[code].get(self._slab(lat), ()):
+            if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+        return inside
+
+    def _candidates(self, lat, lon, lat_distance, lon_distance):
+        """States whose bounding box comes within the given distances of the point"""
+        codes = set()
+        for cell_x in range(self._cell(lon - lon_distance), self._cell(lon + lon_distance) + 1):
+            for cell_y in range(self._cell(lat - lat_distance), self._cell(lat + lat_distance) + 1):
+                codes.update(self._grid.get((cell_x, cell_y), ()))
+        return codes
+
+    def nearest(self, lat, lon, max_distance):
+        """
+        Return the state whose boundary lies closest to the point, within max_distance
+        degrees. Searches every grid cell the distance reaches, since the nearest state
+        need not be registered in the point's own cell.
+        """
+        scale = math.cos(math.radians(lat))
+        best_code, best_distance = None, max_distance
+        slabs = range(self._slab(lat - max_distance), self._slab(lat + max_distance) + 1)
+        for code in self._candidates(lat, lon, max_distance, max_distance / scale):
+            for slab in slabs:
+                for x1, y1, x2, y2 in self._slabs[code].get(slab, ()):
+                    # Point-to-segment distance on a locally flattened plane
+                    dx, dy = (x2 - x1) * scale, y2 - y1
+                    px, py = (lon - x1) * scale, lat - y1
+                    t = max(0.0, min(1.0, (px * dx + py * dy) / (dx * dx + dy * dy)))
+                    distance = math.hypot(px - t * dx, py - t * dy)
+                    if distance < best_distance:
+                        best_code, best_distance = code, distance
+        return best_code
+
+    def resolve(self, lat, lon, snap_distance=0.1):
+        """Return the two-letter state code containing the point, or None"""
+        for code in self._grid.get((self._cell(lon), self._cell(lat)), ()):
+            if self.contains(code, lat, lon):
+                return code
+        # The bundled boundaries are coarse, so coastal points can land just outside them
+        if snap_distance:
+            return self.nearest(lat, lon, snap_distance)
+        return None
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_state_resolver():
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = StateResolver.from_file()
+    return _resolver
+
+
+def resolve_state(lat, lon):
+    """Resolve a coordinate to a state code from the bundled boundaries, without any network call"""
+    return get_state_resolver().resolve(float(lat), float(lon))
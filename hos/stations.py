@@ -0,0 +1,143 @@
+import csv
+import math
+import os
+import threading
+import requests
+from django.conf import settings
+from hos import http_client
+from hos.geometry import haversine_miles
+
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+MILES_PER_DEGREE_LAT = 69.0
+STATION_FIELDS = ['name', 'brand', 'lat', 'lon']
+
+
+class StationIndex:
+    """In-memory grid index of fuel stations supporting radius and k-nearest queries"""
+
+    def __init__(self, stations, cell_size=0.25):
+        self.cell_size = cell_size
+        self.stations = []
+        self._buckets = {}
+        for station in stations:
+            lat, lon = float(station['lat']), float(station['lon'])
+            self._buckets.setdefault(self._cell(lat, lon), []).append(len(self.stations))
+            self.stations.append({
+                'name': station.get('name') or 'Unknown Gas Station',
+                'brand': station.get('brand') or 'Unknown Brand',
+                'location': [lat, lon],
+            })
+
+    def __len__(self):
+        return len(self.stations)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def within(self, lat, lon, radius_miles, limit=None):
+        """Return stations within radius_miles of the point, closest first"""
+        lat, lon = float(lat), float(lon)
+        dlat = radius_miles / MILES_PER_DEGREE_LAT
+        dlon = radius_miles / (MILES_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+        min_row, min_col = self._cell(lat - dlat, lon - dlon)
+        max_row, max_col = self._cell(lat + dlat, lon + dlon)
+
+        results = []
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                for i in self._buckets.get((row, col), ()):
+                    station = self.stations[i]
+                    distance = haversine_miles(lat, lon, *station['location'])
+                    if distance <= radius_miles:
+                        results.append(dict(station, distance=round(distance, 2)))
+
+        results.sort(key=lambda x: x['distance'])
+        return results[:limit] if limit else results
+
+    def nearest(self, lat, lon, k=5, max_radius_miles=250):
+        """Return the k closest stations, widening the search radius until enough are found"""
+        radius = self.cell_size * MILES_PER_DEGREE_LAT
+        while True:
+            results = self.within(lat, lon, radius)
+            if len(results) >= k or radius >= max_radius_miles:
+                return results[:k]
+            radius = min(radius * 2, max_radius_miles)
+
+
+def stations_from_overpass(elements):
+    """Convert Overpass elements into station rows; ways and relations need "out center" output"""
+    for element in elements:
+        tags = element.get('tags', {})
+        if tags.get('amenity') != 'fuel':
+            continue
+        point = element if 'lat' in element else element.get('center')
+        if point:
+            yield {
+                'name': tags.get('name', ''),
+                'brand': tags.get('brand', ''),
+                'lat': round(float(point['lat']), 6),
+                'lon': round(float(point['lon']), 6),
+            }
+
+
+def fetch_corridor_stations(paths, radius_km):
+    """
+    Fetch every fuel station within radius_km of the given paths in one Overpass request.
+
+    Each path is a list of [lat, lng] points. Returns a StationIndex over the
+    results, or None if the request failed.
+    """
+    clauses = []
+    for path in paths:
+        points = ",".join(f"{lat:.5f},{lon:.5f}" for lat, lon in path)
+        for kind in ('node', 'way', 'relation'):
+            clauses.append(f'{kind}["amenity"="fuel"](around:{radius_km * 1000},{points});')
+    if not clauses:
+        return StationIndex([])
+
+    query = "[out:json][timeout:25];\n(\n" + "\n".join(clauses) + "\n);\nout center;"
+    try:
+        response = http_client.post(OVERPASS_URL, data=query)
+        if response.status_code == 200:
+            return StationIndex(stations_from_overpass(response.json().get('elements', [])))
+    except (requests.RequestException, ValueError):
+        pass
+    return None
+
+
+def load_stations(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def write_stations(path, stations):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=STATION_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(stations)
+
+
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+
+
+def get_station_index():
+    """Return the process-wide station index, or None when no station file has been built"""
+    global _index, _index_mtime
+    path = getattr(settings, 'FUEL_STATIONS_PATH', None)
+    try:
+        mtime = os.path.getmtime(path) if path else None
+    except OSError:
+        mtime = None
+    if mtime is None:
+        return None
+
+    # Reload when the file is rebuilt so workers pick up a fresh index without a restart
+    if _index is None or _index_mtime != mtime:
+        with _index_lock:
+            if _index is None or _index_mtime != mtime:
+                _index = StationIndex(load_stations(path))
+                _index_mtime = mtime
+    return _index
@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_to_epoch
+from hos import roles
+
+User = get_user_model()
+
+
+def add_role_claims(token, user):
+    """Embed the user's role and groups so read-only requests can be authorized from the token"""
+    token['username'] = user.username
+    token['is_staff'] = user.is_staff
+    token['role'] = roles.get_role(user)
+    token['groups'] = sorted(roles.group_names(user))
+    # When the claims were read from the database; see ClaimsJWTAuthentication
+    token['roles_checked_at'] = datetime_to_epoch(aware_utcnow())
+    return token
+
+
+class RoleRefreshToken(RefreshToken):
+    """Refresh token whose claims, and those of its access tokens, carry the user's role"""
+
+    @classmethod
+    def for_user(cls, user):
+        return add_role_claims(super().for_user(user), user)
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Re-derive the role claims from the database on every refresh, so the access
+    tokens it issues carry the user's current role and groups.
+    """
+    token_class = RoleRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(**{
+            api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM],
+            'is_active': True,
+        }).first()
+        if user is None:
+            raise AuthenticationFailed('User not found or inactive', code='user_not_found')
+        add_role_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # The blacklist app is not installed
+                    pass
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+
+            data['refresh'] = str(refresh)
+
+        return data
@@ -1,20 +1,33 @@
+import base64
 import math
-import requests
 import json
 from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from Spotter_HOS import settings
+from rest_framework.negotiation import DefaultContentNegotiation
 from .models import Trip, DrivingLog, DailyLogSheet
-from .serializers import DailyLogSheetSerializer, DrivingLogSerializer, TripSerializer, SimplifiedTripSerializer
+from .serializers import (
+    BatchPlanSerializer, DailyLogSheetSerializer, DrivingLogSerializer, TripSerializer,
+    SimplifiedTripSerializer, TripSummarySerializer
+)
 from rest_framework import status
-from datetime import datetime, timedelta
+from datetime import datetime
+from django.conf import settings
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from .utils import HOSCalculator, calculate_trip_info, geocode_location
+from . import aggregates, batch, broadcasts, directions, geometry, http_client, planner, roles
+from .cache import LRUCache, MISSING
+from .concurrency import iterate_in_thread, run_concurrently
+from .geocoding import cached_geocodes, geocode_uncached, wait_for_nominatim
+from .states import resolve_state
+from .stations import fetch_corridor_stations, get_station_index
+from .pagination import TripCursorPagination
 from .permissions import IsAdminOrSupervisor, IsDriver, IsTripDriver, IsTripDriverOrAdmin, TripPermission
 from rest_framework.permissions import IsAuthenticated
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+import numpy as np
 import polyline
 import random
 
@@ -30,73 +43,43 @@ class TripCreateView(generics.CreateAPIView):
             dropoff_coords = request.data.get('dropoff_coordinates')
             
             if pickup_coords and dropoff_coords:
-                directions_url = "https://api.openrouteservice.org/v2/directions/driving-car"
-                headers = {
-                    'Authorization': settings.OPENROUTESERVICE_API_KEY,
-                    'Content-Type': 'application/json',
-                }
-
                 # Try with different search radii
                 search_radii = [350, 1000, 2000, 5000]  # meters
                 success = False
 
                 for radius in search_radii:
-                    body = {
-                        "coordinates": [
-                            [pickup_coords[1], pickup_coords[0]],  # [lng, lat]
-                            [dropoff_coords[1], dropoff_coords[0]]
-                        ],
-                        "radiuses": [radius, radius],  # Search radius for each coordinate
-                        "preference": "fastest",
-                        "units": "mi",
-                        "continue_straight": False,
-                        "geometry_simplify": True
-                    }
-
-                    response = requests.post(directions_url, json=body, headers=headers)
-
-                    if response.status_code == 200:
+                    route = directions.get_route(
+                        pickup_coords, dropoff_coords,
+                        radiuses=[radius, radius],  # Search radius for each coordinate
+                        units='mi'
+                    )
+
+                    if route:
                         success = True
-                        data = response.json()
-                        
-                        if 'routes' in data and data['routes']:
-                            route = data['routes'][0]
-                            route_summary = route['summary']
-                            
-                            # Calculate distances
-                            total_distance_miles = route_summary['distance'] * 0.621371  # Convert meters to miles
-                            total_duration_hours = route_summary['duration'] / 3600  # Convert seconds to hours
-                            
-                            # Add the calculated values to request data
-                            request.data['total_distance'] = float(f"{total_distance_miles:.2f}")
-                            request.data['estimated_driving_time'] = float(f"{total_duration_hours:.2f}")
-                            
-                            # Create and save the trip using the serializer
-                            serializer = self.get_serializer(data=request.data)
-                            serializer.is_valid(raise_exception=True)
-                            self.perform_create(serializer)
-                            headers = self.get_success_headers(serializer.data)
-                            
-                            return Response(
-                                serializer.data,
-                                status=status.HTTP_201_CREATED,
-                                headers=headers
-                            )
-                        break
+
+                        # Calculate distances
+                        total_distance_miles = route['distance']  # Requested in miles
+                        total_duration_hours = route['duration'] / 3600  # Convert seconds to hours
+
+                        # Add the calculated values to request data
+                        request.data['total_distance'] = float(f"{total_distance_miles:.2f}")
+                        request.data['estimated_driving_time'] = float(f"{total_duration_hours:.2f}")
+
+                        # Create and save the trip using the serializer
+                        serializer = self.get_serializer(data=request.data)
+                        serializer.is_valid(raise_exception=True)
+                        self.perform_create(serializer)
+                        headers = self.get_success_headers(serializer.data)
+
+                        return Response(
+                            serializer.data,
+                            status=status.HTTP_201_CREATED,
+                            headers=headers
+                        )
 
                 if not success:
                     # Fallback to Haversine formula
-                    R = 3959  # Earth's radius in miles
-                    
-                    # Convert decimal degrees to radians
-                    lat1, lon1, lat2, lon2 = map(math.radians, [pickup_coords[0], pickup_coords[1], dropoff_coords[0], dropoff_coords[1]])
-                    
-                    # Haversine formula
-                    dlat = lat2 - lat1
-                    dlon = lon2 - lon1
-                    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-                    c = 2 * math.asin(math.sqrt(a))
-                    distance = R * c
+                    distance = geometry.haversine_miles(pickup_coords[0], pickup_coords[1], dropoff_coords[0], dropoff_coords[1])
                     
                     # Estimate duration (assuming average speed of 60 mph)
                     duration = distance / 60
@@ -138,7 +121,7 @@ class TripCreateView(generics.CreateAPIView):
             dropoff_coords = self.request.data.get('dropoff_coordinates')
             
             # Check if user is a driver
-            is_driver = user.groups.filter(name='drivers').exists()
+            is_driver = roles.is_driver(user)
             
             # Create trip with coordinates
             trip_data = {
@@ -147,25 +130,22 @@ class TripCreateView(generics.CreateAPIView):
                 'dropoff_coordinates': dropoff_coords
             }
             
-            trip = serializer.save(**trip_data)
-            
-            # Send WebSocket notification
-            try:
-                channel_layer = get_channel_layer()
-                trip_data = TripSerializer(trip).data
-                async_to_sync(channel_layer.group_send)(
-                    'all_trips',
-                    {
-                        'type': 'trip_created',
-                        'trip': trip_data
-                    }
-                )
-            except Exception:
-                pass
+            # The notification is recorded in the outbox with the trip
+            with transaction.atomic():
+                trip = serializer.save(**trip_data)
+                broadcasts.broadcast_trip_created(trip)
 
         except Exception as e:
             raise
 
+class RouteContentNegotiation(DefaultContentNegotiation):
+    """Leaves ?format=polyline and ?format=packed to TripRouteView instead of treating them as renderer names"""
+
+    def filter_renderers(self, renderers, format):
+        if format in TripRouteView.GEOMETRY_FORMATS:
+            return renderers
+        return super().filter_renderers(renderers, format)
+
 class TripRouteView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -277,14 +257,99 @@ class TripRouteView(APIView):
         'WY': [41.1399, -104.8202]  # Cheyenne
     }
 
+    # Compact geometry encodings selectable with ?format=
+    GEOMETRY_FORMATS = ('polyline', 'packed')
+    content_negotiation_class = RouteContentNegotiation
+
+    # Decoded route geometries, and rendered geometry variants per (trip, geometry, tolerance, format)
+    decoded_cache = LRUCache(maxsize=getattr(settings, 'ROUTE_GEOMETRY_CACHE_SIZE', 256))
+    geometry_cache = LRUCache(maxsize=getattr(settings, 'ROUTE_GEOMETRY_CACHE_SIZE', 256))
+
+    @staticmethod
+    def get_simplify_tolerance(request, latitude):
+        """Douglas-Peucker tolerance in meters from the tolerance or zoom query parameter, or None"""
+        tolerance = request.query_params.get('tolerance')
+        zoom = request.query_params.get('zoom')
+        if tolerance is not None:
+            try:
+                tolerance = float(tolerance)
+            except ValueError:
+                tolerance = -1
+            if not math.isfinite(tolerance) or tolerance < 0:
+                raise ValueError("tolerance must be a non-negative number of meters")
+            return tolerance
+        if zoom is not None:
+            if not zoom.isdigit() or not 0 <= int(zoom) <= 22:
+                raise ValueError("zoom must be an integer between 0 and 22")
+            zoom = int(zoom)
+            # One screen pixel at that zoom level
+            return geometry.meters_per_pixel(latitude, zoom)
+        return None
+
+    def decode_route(self, route):
+        """Decoded [lat, lng] points of the route geometry, decoded once per geometry"""
+        encoded = route['geometry']
+        if not isinstance(encoded, str):
+            # GeoJSON geometry uses [lng, lat]
+            return geometry.as_points(encoded['coordinates'])[:, ::-1].copy()
+
+        points = self.decoded_cache.get(encoded)
+        if points is MISSING:
+            points = geometry.as_points(polyline.decode(encoded))
+            self.decoded_cache.set(encoded, points)
+        return points
+
+    def render_geometry(self, trip_id, route, points, tolerance, geometry_format, anchors=()):
+        """
+        Return (payload, kept) for the requested geometry format, where kept holds the
+        indices of the points that survived simplification (None when nothing was dropped).
+        Points at the anchors indices are never simplified away.
+        """
+        if not tolerance and geometry_format == 'polyline' and isinstance(route['geometry'], str):
+            # Hand back ORS's own encoding untouched
+            return {"format": "polyline", "precision": 5, "data": route['geometry'], "points": len(points)}, None
+
+        key = (trip_id, route['geometry'] if isinstance(route['geometry'], str) else None,
+               round(tolerance, 1) if tolerance else None, geometry_format, tuple(anchors))
+        cached = self.geometry_cache.get(key) if key[1] else MISSING
+        if cached is not MISSING:
+            return cached
+
+        kept = geometry.simplify(points, tolerance, anchors) if tolerance else None
+        output = points[kept] if kept is not None else points
+        if geometry_format == 'polyline':
+            payload = {"format": "polyline", "precision": 5, "data": polyline.encode(output.tolist()), "points": len(output)}
+        elif geometry_format == 'packed':
+            payload = {
+                "format": "packed",
+                "dtype": "float32",
+                "byteorder": "little",
+                "layout": "lat,lng",
+                "encoding": "base64",
+                "data": base64.b64encode(output.astype('<f4').tobytes()).decode('ascii'),
+                "points": len(output)
+            }
+        else:
+            payload = output.tolist()
+
+        if key[1]:
+            self.geometry_cache.set(key, (payload, kept))
+        return payload, kept
+
     @staticmethod
     def get_state_from_coordinates(lat, lon):
-        """Get the state code from coordinates using reverse geocoding"""
+        """Get the state code from coordinates, using the bundled state boundaries before reverse geocoding"""
+        state = resolve_state(lat, lon)
+        if state:
+            return state
+
+        # Points outside the bundled lower-48 boundaries (Alaska, Hawaii, offshore) still go to Nominatim
         try:
             # Use OpenStreetMap's Nominatim service for reverse geocoding
             url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}&zoom=5"
             headers = {'User-Agent': 'HOS_App/1.0'}
-            response = requests.get(url, headers=headers)
+            wait_for_nominatim()
+            response = http_client.get(url, headers=headers)
             
             if response.status_code == 200:
                 data = response.json()
@@ -308,21 +373,7 @@ class TripRouteView(APIView):
 
     def calculate_distance(self, lat1, lon1, lat2, lon2):
         """Calculate distance between two points in miles using the Haversine formula"""
-        R = 3959  # Earth's radius in miles
-        
-        # Convert decimal degrees to radians
-        lat1, lon1, lat2, lon2 = map(math.radians, [float(lat1), float(lon1), float(lat2), float(lon2)])
-        
-        # Haversine formula
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a))
-        
-        # Calculate the distance
-        distance = R * c
-        
-        return distance
+        return geometry.haversine_miles(lat1, lon1, lat2, lon2)
 
     def get(self, request, pk):
         try:
@@ -338,9 +389,17 @@ class TripRouteView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
+            geometry_format = request.query_params.get('format', 'json')
+            try:
+                tolerance = self.get_simplify_tolerance(request, pickup_coords[0])
+            except ValueError as e:
+                return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
             # Get states from coordinates
-            pickup_state = self.get_state_from_coordinates(pickup_coords[0], pickup_coords[1])
-            dropoff_state = self.get_state_from_coordinates(dropoff_coords[0], dropoff_coords[1])
+            pickup_state, dropoff_state = run_concurrently([
+                lambda: self.get_state_from_coordinates(pickup_coords[0], pickup_coords[1]),
+                lambda: self.get_state_from_coordinates(dropoff_coords[0], dropoff_coords[1]),
+            ])
 
             if not pickup_state or not dropoff_state:
                 return Response(
@@ -359,224 +418,99 @@ class TripRouteView(APIView):
                 )
 
             # First try to get the route between major cities
-            directions_url = "https://api.openrouteservice.org/v2/directions/driving-car"
-            headers = {
-                'Authorization': settings.OPENROUTESERVICE_API_KEY,
-                'Content-Type': 'application/json',
-            }
-
-            body = {
-                "coordinates": [
-                    [pickup_city[1], pickup_city[0]],  # [lng, lat]
-                    [dropoff_city[1], dropoff_city[0]]
-                ],
-                "preference": "fastest",
-                "units": "mi",
-                "continue_straight": False,
-                "geometry_simplify": True,
-                "instructions": True
-            }
-
-            response = requests.post(directions_url, json=body, headers=headers)
+            route = directions.get_route(pickup_city, dropoff_city, instructions=True, units='mi')
 
-            if response.status_code != 200:
+            if not route:
                 return Response(
                     {"detail": "Could not find a valid route between the states"}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            data = response.json()
-
-            if 'routes' not in data or not data['routes']:
-                return Response(
-                    {"detail": "No routes found"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            route = data['routes'][0]
-            
-            # Calculate total distance using the route segments
-            total_distance_meters = 0
-            for segment in route['segments']:
-                total_distance_meters += segment['distance']
-            
-            # Convert to miles
-            total_distance_miles = round(total_distance_meters / 1609.34, 2)  # meters to miles
+            # OpenRouteService already returns miles (units='mi')
+            total_distance_miles = round(route['distance'], 2)  # requested in miles
             
             # Calculate total duration
-            total_duration_seconds = route['summary']['duration']
+            total_duration_seconds = route['duration']
             total_duration_hours = round(total_duration_seconds / 3600, 2)
 
             # Add 1 hour for pickup and 1 hour for drop-off (ON Duty)
             total_duration_hours += 2
 
-            # Decode the polyline geometry
-            try:
-                # The geometry is a polyline string
-                decoded_coords = polyline.decode(route['geometry'])
-                # Convert to [lat, lng] format (OpenRouteService uses [lng, lat])
-                coordinates = [[coord[0], coord[1]] for coord in decoded_coords]
-            except Exception as e:
-                coordinates = []
-                for segment in route['segments']:
-                    for step in segment['steps']:
-                        for way_point in step['way_points']:
-                            if 'coordinates' in route['geometry']:
-                                coord = route['geometry']['coordinates'][way_point]
-                                coordinates.append([coord[1], coord[0]])
-            
-            # Remove duplicates while preserving order
-            coordinates = list(dict.fromkeys(map(tuple, coordinates)))
-            coordinates = [list(coord) for coord in coordinates]
+            # Decode the polyline geometry (cached per route)
+            points = self.decode_route(route)
+
+            # Compact formats index into the geometry as encoded; the JSON list drops repeated points
+            if geometry_format not in self.GEOMETRY_FORMATS:
+                geometry_format = 'json'
+                points = geometry.dedupe_consecutive(points)
 
             # Process steps with accurate distances
             steps = []
-            for segment in route['segments']:
-                for step in segment['steps']:
-                    step_distance_miles = round(step['distance'] / 1609.34, 2)  # meters to miles
-                    step_duration_hours = round(step['duration'] / 3600, 2)  # seconds to hours
-                    steps.append({
-                        "instruction": step['instruction'],
-                        "distance_miles": step_distance_miles,
-                        "estimated_time_hours": step_duration_hours
-                    })
-
-            # Calculate required breaks and fuel stops based on HOS rules
-            MAX_DRIVING_HOURS = 11  # Maximum driving hours per day
-            BREAK_TIME_MINUTES = 30  # Break time between driving sessions
-            FUEL_STOP_DISTANCE = 1000  # Miles between fuel stops
-            FUEL_STOP_TIME_MINUTES = 30  # Time for fuel stop
-
-            # Calculate number of days needed
-            driving_hours_per_day = min(MAX_DRIVING_HOURS, total_duration_hours)
-            num_days = math.ceil(total_duration_hours / driving_hours_per_day)
-
-            # Calculate number of breaks needed
-            num_breaks = math.ceil(total_duration_hours / 4)  # Break every 4 hours
-            total_break_time = num_breaks * (BREAK_TIME_MINUTES / 60)  # Convert to hours
-
-            # Calculate number of fuel stops needed
-            num_fuel_stops = math.ceil(total_distance_miles / FUEL_STOP_DISTANCE)
-            total_fuel_stop_time = num_fuel_stops * (FUEL_STOP_TIME_MINUTES / 60)  # Convert to hours
+            for step in route['steps']:
+                step_distance_miles = round(step['distance'], 2)  # requested in miles
+                step_duration_hours = round(step['duration'] / 3600, 2)  # seconds to hours
+                steps.append({
+                    "instruction": step['instruction'],
+                    "distance_miles": step_distance_miles,
+                    "estimated_time_hours": step_duration_hours
+                })
+                if geometry_format != 'json' and step.get('way_points'):
+                    steps[-1]["way_points"] = list(step['way_points'])
 
             # Calculate fuel stops
-            fuel_stops = []
-            miles_so_far = 0
-            
-            # Pre-calculate cumulative distances for each coordinate
-            cumulative_distances = [0]
-            for i in range(len(coordinates) - 1):
-                lat1, lon1 = coordinates[i]
-                lat2, lon2 = coordinates[i + 1]
-                segment_distance = self.calculate_distance(lat1, lon1, lat2, lon2)
-                cumulative_distances.append(cumulative_distances[-1] + segment_distance)
-
-                # Check if we need a fuel stop
-                if cumulative_distances[-1] >= FUEL_STOP_DISTANCE * (len(fuel_stops) + 1):
-                    fuel_stop_coord = coordinates[i]
-                    gas_stations = self.find_nearby_gas_stations(fuel_stop_coord[0], fuel_stop_coord[1], radius=25)
-                    
-                    if not gas_stations:
-                        # Look for stations within 50 miles
-                        search_range = 50
-                        search_coords = []
-                        
-                        # Add coordinates before and after
-                        for j in range(max(0, i - 10), min(len(coordinates), i + 11)):
-                            if abs(cumulative_distances[j] - cumulative_distances[i]) <= search_range:
-                                search_coords.append(coordinates[j])
-                        
-                        # Search for gas stations
-                        for coord in search_coords:
-                            stations = self.find_nearby_gas_stations(coord[0], coord[1], radius=10)
-                            if stations:
-                                gas_stations = stations
-                                fuel_stop_coord = coord
-                                break
-                    
-                    fuel_stops.append({
-                        "location": fuel_stop_coord,
-                        "distance_from_start": round(cumulative_distances[i], 2),
-                        "gas_stations": gas_stations,
-                        "status": "OFF",  # Fuel stops are OFF duty
-                        "duration_minutes": FUEL_STOP_TIME_MINUTES
-                    })
-
-            # Calculate daily schedule
-            daily_schedule = []
-            remaining_hours = total_duration_hours
-            current_day = 1
-
-            while remaining_hours > 0 and current_day <= num_days:
-                day_schedule = {
-                    "day": current_day,
-                    "activities": []
-                }
-
-                # Add pickup time if it's day 1
-                if current_day == 1:
-                    day_schedule["activities"].append({
-                        "type": "ON",
-                        "description": "Pickup",
-                        "duration_hours": 1
-                    })
-
-                # Add driving sessions with breaks
-                driving_hours_today = min(MAX_DRIVING_HOURS, remaining_hours)
-                sessions = math.ceil(driving_hours_today / 4)  # Break every 4 hours
-
-                for session in range(sessions):
-                    # Add driving session
-                    session_hours = min(4, driving_hours_today - (session * 4))
-                    day_schedule["activities"].append({
-                        "type": "D",
-                        "description": f"Driving Session {session + 1}",
-                        "duration_hours": session_hours
-                    })
-
-                    # Add break if not the last session
-                    if session < sessions - 1:
-                        day_schedule["activities"].append({
-                            "type": "OFF",
-                            "description": "Break",
-                            "duration_hours": BREAK_TIME_MINUTES / 60
-                        })
+            fuel_stops = self.plan_fuel_stops(points, planner.FUEL_STOP_DISTANCE, int(planner.FUEL_STOP_HOURS * 60))
+
+            # Plan the HOS schedule from midnight of the trip's first day
+            schedule_start = timezone.localtime(trip.created_at).replace(hour=0, minute=0, second=0, microsecond=0)
+            intervals = planner.plan_trip(
+                schedule_start,
+                driving_hours=total_duration_seconds / 3600,
+                distance_miles=total_distance_miles,
+                current_cycle_used=trip.current_cycle_used or 0
+            )
+            hours_by_activity = planner.hours_by_activity(intervals)
 
-                # Add dropoff time if it's the last day
-                if current_day == num_days:
-                    day_schedule["activities"].append({
-                        "type": "ON",
-                        "description": "Dropoff",
-                        "duration_hours": 1
-                    })
-
-                # Add remaining time as sleeper berth
-                total_activity_hours = sum(activity["duration_hours"] for activity in day_schedule["activities"])
-                if total_activity_hours < 24:
-                    day_schedule["activities"].append({
-                        "type": "SB",
-                        "description": "Sleeper Berth",
-                        "duration_hours": 24 - total_activity_hours
-                    })
-
-                daily_schedule.append(day_schedule)
-                remaining_hours -= driving_hours_today
-                current_day += 1
+            daily_schedule = []
+            for day_number, (day, day_intervals) in enumerate(planner.split_days(intervals), start=1):
+                daily_schedule.append({
+                    "day": day_number,
+                    "activities": [
+                        {
+                            "type": interval.status,
+                            "description": planner.ACTIVITIES[interval.activity],
+                            "duration_hours": round((interval.end - interval.start).total_seconds() / 3600, 2)
+                        }
+                        for interval in day_intervals
+                    ]
+                })
+
+            # Optional level-of-detail simplification for overview maps. Fuel stops and step
+            # boundaries are passed as anchors, so the points they index are always kept
+            anchors = sorted({fuel_stop["index"] for fuel_stop in fuel_stops}
+                             | {index for step in steps for index in step.get("way_points", ())})
+            route_geometry, kept = self.render_geometry(trip.pk, route, points, tolerance, geometry_format, anchors)
+            if kept is not None:
+                for fuel_stop in fuel_stops:
+                    fuel_stop["index"] = int(geometry.remap_indices(kept, fuel_stop["index"]))
+                for step in steps:
+                    if "way_points" in step:
+                        step["way_points"] = geometry.remap_indices(kept, step["way_points"]).tolist()
 
             route_response = {
-                "coordinates": coordinates,
+                "coordinates": route_geometry,
                 "steps": steps,
                 "total_distance_miles": total_distance_miles,
                 "estimated_total_time_hours": total_duration_hours,
                 "fuel_stops": fuel_stops,
                 "daily_schedule": daily_schedule,
                 "hos_summary": {
-                    "total_days": num_days,
-                    "total_break_time_hours": total_break_time,
-                    "total_fuel_stop_time_hours": total_fuel_stop_time,
-                    "max_driving_hours_per_day": MAX_DRIVING_HOURS,
-                    "break_duration_minutes": BREAK_TIME_MINUTES,
-                    "fuel_stop_distance_miles": FUEL_STOP_DISTANCE
+                    "total_days": len(daily_schedule),
+                    "total_break_time_hours": hours_by_activity['break'],
+                    "total_fuel_stop_time_hours": hours_by_activity['fuel'],
+                    "total_reset_time_hours": hours_by_activity['reset'] + hours_by_activity['restart'],
+                    "max_driving_hours_per_day": planner.MAX_DRIVING_HOURS,
+                    "break_duration_minutes": int(planner.BREAK_HOURS * 60),
+                    "fuel_stop_distance_miles": planner.FUEL_STOP_DISTANCE
                 },
                 "states": {
                     "pickup_state": pickup_state,
@@ -586,6 +520,16 @@ class TripRouteView(APIView):
                 }
             }
 
+            if geometry_format != 'json':
+                route_response["geometry"] = route_response.pop("coordinates")
+
+            if tolerance:
+                route_response["simplification"] = {
+                    "tolerance_meters": round(tolerance, 1),
+                    "original_points": len(points),
+                    "points": len(kept)
+                }
+
             return Response(route_response, status=status.HTTP_200_OK)
 
         except Trip.DoesNotExist:
@@ -599,9 +543,83 @@ class TripRouteView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def plan_fuel_stops(self, points, fuel_stop_distance, fuel_stop_minutes):
+        """Place a fuel stop every fuel_stop_distance miles and look up stations for all of them"""
+        if len(points) < 2:
+            return []
+
+        # Cumulative distances for every coordinate in one vectorized pass
+        cumulative_distances = geometry.cumulative_distances(points)
+
+        # A fuel stop at the start of the segment that crosses each fuel_stop_distance mark
+        marks = np.arange(1, int(cumulative_distances[-1] // fuel_stop_distance) + 1) * fuel_stop_distance
+        stop_indices = [int(i) for i in np.unique(geometry.points_at_offsets(cumulative_distances, marks))]
+
+        # Stops without stations fall back to nearby coordinates within 50 miles
+        candidate_windows = {
+            i: list(geometry.index_window(cumulative_distances, i, max_points=10, max_distance=50))
+            for i in stop_indices
+        }
+
+        # Without a local station index, fetch the whole corridor around every stop in one request.
+        # A 25 km buffer around each window covers both the stop search and the 10 km fallbacks.
+        station_index = get_station_index()
+        if station_index is None and stop_indices:
+            station_index = fetch_corridor_stations(
+                [points[candidate_windows[i]] for i in stop_indices], radius_km=25
+            )
+
+        if station_index is not None:
+            find_stations = lambda lat, lon, radius: station_index.within(lat, lon, radius * 0.621371, limit=5)
+            run_lookups = lambda calls: [call() for call in calls]
+        else:
+            find_stations = lambda lat, lon, radius: self.find_nearby_gas_stations(lat, lon, radius=radius)
+            run_lookups = run_concurrently
+
+        # Search around every stop at once
+        station_results = run_lookups([
+            lambda i=i: find_stations(points[i, 0], points[i, 1], 25)
+            for i in stop_indices
+        ])
+
+        fallback_candidates = {
+            i: candidate_windows[i] for i, gas_stations in zip(stop_indices, station_results) if not gas_stations
+        }
+        fallback_calls = [(i, j) for i, candidates in fallback_candidates.items() for j in candidates]
+        fallback_results = dict(zip(fallback_calls, run_lookups([
+            lambda j=j: find_stations(points[j, 0], points[j, 1], 10)
+            for _, j in fallback_calls
+        ])))
+
+        fuel_stops = []
+        for i, gas_stations in zip(stop_indices, station_results):
+            fuel_stop_index = i
+            # Keep the first candidate (in route order) that found stations
+            for j in fallback_candidates.get(i, []):
+                if fallback_results[(i, j)]:
+                    gas_stations = fallback_results[(i, j)]
+                    fuel_stop_index = j
+                    break
+
+            fuel_stops.append({
+                "location": points[fuel_stop_index].tolist(),
+                "index": int(fuel_stop_index),
+                "distance_from_start": round(float(cumulative_distances[i]), 2),
+                "gas_stations": gas_stations,
+                "status": "OFF",  # Fuel stops are OFF duty
+                "duration_minutes": fuel_stop_minutes
+            })
+
+        return fuel_stops
+
     def find_nearby_gas_stations(self, lat, lon, radius=5):
-        """Find gas stations near the given coordinates"""
-        # Use OpenStreetMap's Overpass API to find gas stations
+        """Find gas stations within radius km of the given coordinates"""
+        # Prefer the local station index when one has been built
+        station_index = get_station_index()
+        if station_index is not None:
+            return station_index.within(lat, lon, radius * 0.621371, limit=5)
+
+        # Otherwise use OpenStreetMap's Overpass API to find gas stations
         overpass_url = "https://overpass-api.de/api/interpreter"
         query = f"""
         [out:json][timeout:25];
@@ -616,7 +634,7 @@ class TripRouteView(APIView):
         """
         
         try:
-            response = requests.post(overpass_url, data=query)
+            response = http_client.post(overpass_url, data=query)
             if response.status_code == 200:
                 data = response.json()
                 gas_stations = []
@@ -642,7 +660,7 @@ class TripRouteView(APIView):
         return []
 
 class TripDetailView(generics.RetrieveAPIView):
-    queryset = Trip.objects.all()
+    queryset = Trip.objects.select_related('driver').prefetch_related('logs', 'daily_logs')
     serializer_class = TripSerializer
     permission_classes = [IsAuthenticated]
 
@@ -653,49 +671,26 @@ class TripDetailView(generics.RetrieveAPIView):
         if (instance.pickup_coordinates and instance.dropoff_coordinates and 
             (instance.total_distance is None or instance.estimated_driving_time is None)):
             
-            directions_url = "https://api.openrouteservice.org/v2/directions/driving-car"
-            headers = {
-                'Authorization': settings.OPENROUTESERVICE_API_KEY,
-                'Content-Type': 'application/json',
-            }
-            body = {
-                "coordinates": [
-                    [instance.pickup_coordinates[1], instance.pickup_coordinates[0]],  # [lng, lat]
-                    [instance.dropoff_coordinates[1], instance.dropoff_coordinates[0]]
-                ],
-                "preference": "fastest",
-                "units": "mi",
-                "continue_straight": False,
-                "geometry_simplify": True,
-                "instructions": True
-            }
-
-            response = requests.post(directions_url, json=body, headers=headers)
+            route = directions.get_route(
+                instance.pickup_coordinates, instance.dropoff_coordinates,
+                instructions=True, units='mi'
+            )
 
-            if response.status_code == 200:
-                data = response.json()
-                if 'routes' in data and data['routes']:
-                    route = data['routes'][0]
-                    
-                    # Calculate total distance using the route segments
-                    total_distance_meters = 0
-                    for segment in route['segments']:
-                        total_distance_meters += segment['distance']
-                    
-                    # Convert to miles
-                    total_distance_miles = round(total_distance_meters / 1609.34, 2)  # meters to miles
-                    
-                    # Calculate total duration
-                    total_duration_seconds = route['summary']['duration']
-                    total_duration_hours = round(total_duration_seconds / 3600, 2)
+            if route:
+                # OpenRouteService already returns miles (units='mi')
+                total_distance_miles = round(route['distance'], 2)  # requested in miles
+                
+                # Calculate total duration
+                total_duration_seconds = route['duration']
+                total_duration_hours = round(total_duration_seconds / 3600, 2)
 
-                    # Add 1 hour for pickup and 1 hour for drop-off (ON Duty)
-                    total_duration_hours += 2
+                # Add 1 hour for pickup and 1 hour for drop-off (ON Duty)
+                total_duration_hours += 2
 
-                    # Update the trip fields
-                    instance.total_distance = total_distance_miles
-                    instance.estimated_driving_time = total_duration_hours
-                    instance.save()
+                # Update the trip fields
+                instance.total_distance = total_distance_miles
+                instance.estimated_driving_time = total_duration_hours
+                instance.save()
 
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -745,49 +740,26 @@ class AddLogView(APIView):
 
             serializer = DrivingLogSerializer(data=request.data)
             if serializer.is_valid():
-                log = serializer.save(trip=trip)  # attach trip directly here
+                # The notification is recorded in the outbox with the log and sent after commit
+                with transaction.atomic():
+                    log = serializer.save(trip=trip)  # attach trip directly here
+
+                    changed = []
+                    if 'location' in request.data:
+                        previous_status = trip.status
+                        trip.current_location = request.data['location']
+                        if trip.status == 'NOT_STARTED':
+                            trip.status = 'IN_PROGRESS'
+                        
+                        # Check if driver has arrived at the drop-off location
+                        if trip.current_location.lower() == trip.dropoff_location.lower():
+                            trip.status = 'COMPLETED'
+                        
+                        changed = ['current_location'] + (['status'] if trip.status != previous_status else [])
 
-                if 'location' in request.data:
-                    trip.current_location = request.data['location']
-                    if trip.status == 'NOT_STARTED':
-                        trip.status = 'IN_PROGRESS'
-                    
-                    # Check if driver has arrived at the drop-off location
-                    if trip.current_location.lower() == trip.dropoff_location.lower():
-                        trip.status = 'COMPLETED'
-                    
-                    trip.save()
-                    
-                    # Send WebSocket notification for trip update
-                    channel_layer = get_channel_layer()
-                    trip_data = TripSerializer(trip).data
-                    async_to_sync(channel_layer.group_send)(
-                        f'trip_{trip.id}',
-                        {
-                            'type': 'trip_update',
-                            'trip': trip_data
-                        }
-                    )
-                    
-                    # Also notify the all_trips group
-                    async_to_sync(channel_layer.group_send)(
-                        'all_trips',
-                        {
-                            'type': 'trip_updated',
-                            'trip': trip_data
-                        }
-                    )
-                
-                # Send WebSocket notification for log update
-                channel_layer = get_channel_layer()
-                log_data = DrivingLogSerializer(log).data
-                async_to_sync(channel_layer.group_send)(
-                    f'trip_{trip.id}',
-                    {
-                        'type': 'log_created',
-                        'log': log_data
-                    }
-                )
+                    # One versioned delta carries the new log and any trip fields it changed
+                    broadcasts.save_trip(trip, changed)
+                    broadcasts.broadcast_trip_changes(trip, changed, log=log)
                 
                 return Response(DrivingLogSerializer(log).data, status=status.HTTP_201_CREATED)
             else:
@@ -812,19 +784,8 @@ class DailyLogView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
                 
-            driving_hours = sum((log.end_time - log.start_time).total_seconds() / 3600 for log in logs if log.status == 'D')
-            on_duty_hours = sum((log.end_time - log.start_time).total_seconds() / 3600 for log in logs if log.status == 'ON')
-            off_duty_hours = sum((log.end_time - log.start_time).total_seconds() / 3600 for log in logs if log.status == 'OFF')
-            sleeper_berth_hours = sum((log.end_time - log.start_time).total_seconds() / 3600 for log in logs if log.status == 'SB')
-
-            
-            # Calculate totals for the day
-            totals = {
-                'driving_hours': driving_hours,
-                'on_duty_hours': on_duty_hours,
-                'off_duty_hours': off_duty_hours,
-                'sleeper_berth_hours': sleeper_berth_hours,
-            }
+            # Calculate totals for the day in the database
+            totals = logs.daily_totals()
             
             response = {
                 'date': date,
@@ -855,66 +816,30 @@ class DailyLogGenerator(APIView):
         dropoff_coords = geocode_location(trip.dropoff_location)
 
         if pickup_coords and dropoff_coords:
-            directions_url = "https://api.openrouteservice.org/v2/directions/driving-car"
-            headers = {
-                'Authorization': settings.OPENROUTESERVICE_API_KEY,
-                'Content-Type': 'application/json',
-            }
-            body = {
-                "coordinates": [
-                    [pickup_coords[1], pickup_coords[0]],  # [lng, lat]
-                    [dropoff_coords[1], dropoff_coords[0]]
-                ]
-            }
-
-            response = requests.post(directions_url, json=body, headers=headers)
+            route = directions.get_route(pickup_coords, dropoff_coords)
 
-            if response.status_code == 200:
-                data = response.json()
-                route = data['features'][0]['properties']['summary']
+            if route:
                 trip.total_distance = route['distance'] / 1000 * 0.621371  # meters ➔ km ➔ miles
                 trip.estimated_driving_time = route['duration'] / 3600  # seconds ➔ hours
                 trip.save()
 
     def post(self, request, pk):
         trip = Trip.objects.get(pk=pk)
-        date = request.data.get('date', timezone.now().date())
-        
-        logs = DrivingLog.objects.filter(
-            trip=trip,
-            start_time__date=date
-        )
-        
-        driving_hours = sum(
-            (log.end_time - log.start_time).total_seconds() / 3600
-            for log in logs if log.status == 'D'
-        )
-
-        on_duty_hours = sum(
-            (log.end_time - log.start_time).total_seconds() / 3600
-            for log in logs if log.status == 'ON'
-        )
-
-        off_duty_hours = sum(
-            (log.end_time - log.start_time).total_seconds() / 3600
-            for log in logs if log.status == 'OFF'
-        )
+        date = request.data.get('date') or timezone.localdate()
+        if isinstance(date, str):
+            try:
+                date = datetime.strptime(date, '%Y-%m-%d').date()
+            except ValueError:
+                return Response(
+                    {"error": "Invalid date format. Use YYYY-MM-DD"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        sleeper_berth_hours = sum(
-            (log.end_time - log.start_time).total_seconds() / 3600
-            for log in logs if log.status == 'SB'
-        )
+        # Totals are kept up to date as logs change; only days from before that need a backfill
+        daily_log = DailyLogSheet.objects.filter(trip=trip, date=date).first()
+        if daily_log is None:
+            daily_log = aggregates.rebuild_day(trip.id, date)
 
-        
-        daily_log = DailyLogSheet.objects.create(
-            trip=trip,
-            date=date,
-            driving_hours=driving_hours,
-            on_duty_hours=on_duty_hours,
-            off_duty_hours=off_duty_hours,
-            sleeper_berth_hours=sleeper_berth_hours
-        )
-        
         return Response(DailyLogSheetSerializer(daily_log).data)
 
 # New view for drivers to assign trips to themselves
@@ -924,7 +849,7 @@ class AssignTripView(APIView):
     def post(self, request, pk):
         print(f"\n=== AssignTripView Debug ===")
         print(f"User: {request.user.username}")
-        print(f"User groups: {list(request.user.groups.all())}")
+        print(f"User groups: {sorted(roles.group_names(request.user))}")
         print(f"Trip ID: {pk}")
         
         try:
@@ -949,34 +874,12 @@ class AssignTripView(APIView):
             
             # Assign trip to the current user
             trip.driver = request.user
-            trip.save()
+            # The notification is recorded in the outbox with the assignment
+            with transaction.atomic():
+                broadcasts.save_trip(trip, ['driver'])
+                broadcasts.broadcast_trip_changes(trip, ['driver'])
             print(f"Successfully assigned trip to {request.user.username}")
             
-            # Send WebSocket notification
-            try:
-                channel_layer = get_channel_layer()
-                trip_data = TripSerializer(trip).data
-                async_to_sync(channel_layer.group_send)(
-                    f'trip_{trip.id}',
-                    {
-                        'type': 'trip_update',
-                        'trip': trip_data
-                    }
-                )
-                
-                # Also notify the all_trips group
-                async_to_sync(channel_layer.group_send)(
-                    'all_trips',
-                    {
-                        'type': 'trip_updated',
-                        'trip': trip_data
-                    }
-                )
-                print("WebSocket notifications sent successfully")
-            except Exception as ws_error:
-                print(f"WebSocket notification failed: {str(ws_error)}")
-                # Don't fail the request if WebSocket fails
-            
             return Response({
                 "message": f"Trip successfully assigned to {request.user.username}",
                 "trip_id": trip.id
@@ -997,36 +900,56 @@ class AssignTripView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class TripListMixin:
+    """
+    Trip list views serialize summary rows by default; ?include=logs nests each trip's
+    driving logs and daily logs, fetched with one prefetch query each. Results are
+    cursor paginated, newest first.
+    """
+    serializer_class = TripSummarySerializer
+    pagination_class = TripCursorPagination
+
+    def include_logs(self):
+        return 'logs' in self.request.query_params.get('include', '').split(',')
+
+    def get_serializer_class(self):
+        return TripSerializer if self.include_logs() else TripSummarySerializer
+
+    def get_trip_queryset(self):
+        return Trip.objects.all()
+
+    def get_queryset(self):
+        queryset = self.get_trip_queryset().select_related('driver')
+        if self.include_logs():
+            queryset = queryset.prefetch_related('logs', 'daily_logs')
+        return queryset
+
 # New view for listing available trips (unassigned trips)
-class AvailableTripsView(generics.ListAPIView):
-    serializer_class = TripSerializer
+class AvailableTripsView(TripListMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
+    def get_trip_queryset(self):
         return Trip.objects.filter(driver__isnull=True, status='NOT_STARTED')
 
 # New view for listing driver's assigned trips
-class DriverTripsView(generics.ListAPIView):
-    serializer_class = TripSerializer
+class DriverTripsView(TripListMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsDriver]
     
-    def get_queryset(self):
-        return Trip.objects.filter(driver=self.request.user)
+    def get_trip_queryset(self):
+        return Trip.objects.filter(driver_id=self.request.user.id)
 
 # New view for admins/supervisors to list all trips
-class AllTripsView(generics.ListAPIView):
-    serializer_class = TripSerializer
+class AllTripsView(TripListMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsAdminOrSupervisor]
     
-    def get_queryset(self):
+    def get_trip_queryset(self):
         return Trip.objects.all()
 
-class DriverAssignedTripsView(generics.ListAPIView):
-    serializer_class = TripSerializer
+class DriverAssignedTripsView(TripListMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
-        return Trip.objects.filter(driver=self.request.user)
+    def get_trip_queryset(self):
+        return Trip.objects.filter(driver_id=self.request.user.id)
 
 class GenerateTripLogsView(APIView):
     permission_classes = [IsAuthenticated, IsTripDriverOrAdmin]
@@ -1057,6 +980,36 @@ class GenerateTripLogsView(APIView):
         """Generate a random start hour between 5 AM and 10 AM"""
         return random.randint(5, 10)
 
+    @staticmethod
+    def plan_log(trip, status, location, remarks, start_time, end_time):
+        """Build an unsaved DrivingLog; bulk_create skips save(), so set the date here"""
+        return DrivingLog(
+            trip=trip,
+            status=status,
+            location=location,
+            remarks=remarks,
+            start_time=start_time,
+            end_time=end_time,
+            date=start_time.date()
+        )
+
+    @staticmethod
+    def get_log_location(trip, interval, trip_start):
+        """Where the driver is during a planned duty period"""
+        if interval.activity == 'pickup':
+            return trip.pickup_location
+        if interval.activity == 'dropoff':
+            return trip.dropoff_location
+        if interval.activity == 'off':
+            return 'Home' if interval.end <= trip_start else 'Truck Stop'
+        return {
+            'drive': 'Highway',
+            'break': 'Rest Area',
+            'fuel': 'Fuel Station',
+            'reset': 'Truck Stop Sleeper',
+            'restart': 'Truck Stop'
+        }[interval.activity]
+
     def post(self, request, pk):
         try:
             print("\n=== Starting Trip Log Generation ===")
@@ -1077,210 +1030,66 @@ class GenerateTripLogsView(APIView):
             print(f"Total distance: {route_info['total_distance']} miles")
             print(f"Base driving time: {route_info['base_driving_time']} hours")
             
-            # Constants for HOS regulations
-            MAX_DRIVING_HOURS = 11  # Maximum driving hours per day
-            DRIVING_SPEED = 60  # Average speed in mph
-            BREAK_TIME_MINUTES = 30  # Required break time
-            PRE_TRIP_MINUTES = 60  # Pre-trip inspection time
-            POST_TRIP_MINUTES = 60  # Post-trip inspection time
-            MORNING_OFF_DUTY_MINUTES = 30  # Morning routine time
-            PARKING_OFF_DUTY_MINUTES = 30  # Parking and meal time
-
-            # Calculate number of days needed
-            total_driving_hours = route_info['base_driving_time']
-            days_needed = min(5, max(1, math.ceil(total_driving_hours / MAX_DRIVING_HOURS)))
-            print(f"\nTrip Duration:")
-            print(f"Total driving hours needed: {total_driving_hours:.2f}")
-            print(f"Number of days required: {days_needed}")
-            
-            # Get the current date in the local timezone
+            # Plan the trip from a random start hour today
             local_tz = timezone.get_current_timezone()
             current_date = timezone.now().astimezone(local_tz).date()
-            
-            # Generate logs for each day
-            remaining_miles = route_info['total_distance']
-            start_hours = []  # Store start hours for each day
-            
-            for day in range(days_needed):
-                # Generate random start hour for this day
-                start_hour = self.get_random_start_hour()
-                start_hours.append(start_hour)
-                print(f"\n=== Generating Logs for Day {day + 1} ===")
-                print(f"Start hour for day {day + 1}: {start_hour:02d}:00")
-                
-                day_start = current_date + timedelta(days=day)
-                day_start_midnight = timezone.make_aware(
-                    datetime.combine(day_start, datetime.min.time()),
-                    timezone=local_tz
-                )
-                current_datetime = timezone.make_aware(
-                    datetime.combine(day_start, datetime.min.time().replace(hour=start_hour)),
-                    timezone=local_tz
-                )
-                day_end = timezone.make_aware(
-                    datetime.combine(day_start, datetime.max.time()) - timedelta(microseconds=1),
-                    timezone=local_tz
-                )
+            trip_start = timezone.make_aware(
+                datetime.combine(current_date, datetime.min.time().replace(hour=self.get_random_start_hour())),
+                timezone=local_tz
+            )
+            intervals = planner.plan_trip(
+                trip_start,
+                driving_hours=route_info['base_driving_time'],
+                distance_miles=route_info['total_distance'],
+                current_cycle_used=trip.current_cycle_used or 0
+            )
+            days = planner.split_days(intervals)
+            print(f"\nTrip Duration:")
+            print(f"Planned duty periods: {len(intervals)}")
+            print(f"Number of days required: {len(days)}")
 
-                # 0. OFF duty from midnight until morning routine
-                print("\nCreating OFF duty log from midnight")
-                DrivingLog.objects.create(
-                    trip=trip,
-                    status='OFF',
-                    location='Home' if day == 0 else 'Truck Stop',
-                    remarks='Off duty rest period',
-                    start_time=day_start_midnight,
-                    end_time=current_datetime
-                )
+            # Build every day's logs in memory, then write them in one transaction
+            start_hours = []  # Store the hour each day's duty starts
+            driving_logs = []
 
-                # 1. Morning OFF Duty (getting ready)
-                print("\nCreating morning OFF duty log")
-                log_start = current_datetime
-                log_end = current_datetime + timedelta(minutes=MORNING_OFF_DUTY_MINUTES)
-                DrivingLog.objects.create(
-                    trip=trip,
-                    status='OFF',
-                    location=trip.pickup_location if day == 0 else "En Route",
-                    remarks='Morning routine / Breakfast',
-                    start_time=log_start,
-                    end_time=log_end
-                )
-                current_datetime = log_end
-
-                # 2. Pre-trip inspection (ON duty)
-                print("\nCreating pre-trip inspection log")
-                log_start = current_datetime
-                log_end = current_datetime + timedelta(minutes=PRE_TRIP_MINUTES)
-                DrivingLog.objects.create(
-                    trip=trip,
-                    status='ON',
-                    location=trip.pickup_location if day == 0 else "En Route",
-                    remarks='Pre-trip inspection and safety checks',
-                    start_time=log_start,
-                    end_time=log_end
-                )
-                current_datetime = log_end
-
-                # 3. First Driving Session (4 hours max)
-                driving_hours = min(4, MAX_DRIVING_HOURS, remaining_miles / DRIVING_SPEED)
-                print(f"\nCreating first driving session: {driving_hours:.2f} hours")
-                log_start = current_datetime
-                log_end = current_datetime + timedelta(hours=driving_hours)
-                DrivingLog.objects.create(
-                    trip=trip,
-                    status='D',
-                    location='Highway',
-                    remarks='Driving session 1',
-                    start_time=log_start,
-                    end_time=log_end
-                )
-                current_datetime = log_end
-                remaining_miles -= driving_hours * DRIVING_SPEED
-
-                # 4. Break/Fuel Stop
-                print(f"\nAdding break: {BREAK_TIME_MINUTES} minutes")
-                log_start = current_datetime
-                log_end = current_datetime + timedelta(minutes=BREAK_TIME_MINUTES)
-                DrivingLog.objects.create(
-                    trip=trip,
-                    status='OFF',
-                    location='Rest Area',
-                    remarks='Fuel stop / Break',
-                    start_time=log_start,
-                    end_time=log_end
-                )
-                current_datetime = log_end
-
-                # 5. Second Driving Session (remaining hours up to MAX_DRIVING_HOURS)
-                driving_hours = min(6, MAX_DRIVING_HOURS - 4, remaining_miles / DRIVING_SPEED)
-                if driving_hours > 0:
-                    print(f"\nCreating second driving session: {driving_hours:.2f} hours")
-                    log_start = current_datetime
-                    log_end = current_datetime + timedelta(hours=driving_hours)
-                    DrivingLog.objects.create(
+            for day_number, (day, day_intervals) in enumerate(days, start=1):
+                print(f"\n=== Generating Logs for Day {day_number} ===")
+                for interval in day_intervals:
+                    driving_logs.append(self.plan_log(
                         trip=trip,
-                        status='D',
-                        location='Highway',
-                        remarks='Driving session 2',
-                        start_time=log_start,
-                        end_time=log_end
-                    )
-                    current_datetime = log_end
-                    remaining_miles -= driving_hours * DRIVING_SPEED
-
-                # 6. Post-trip inspection if it's the last day
-                if day == days_needed - 1:
-                    print("\nCreating post-trip inspection log (last day)")
-                    log_start = current_datetime
-                    log_end = current_datetime + timedelta(minutes=POST_TRIP_MINUTES)
-                    DrivingLog.objects.create(
-                        trip=trip,
-                        status='ON',
-                        location=trip.dropoff_location,
-                        remarks='Post-trip inspection and dropoff procedures',
-                        start_time=log_start,
-                        end_time=log_end
-                    )
-                    current_datetime = log_end
-
-                # 7. Parking and meal time
-                print(f"\nAdding parking/meal time: {PARKING_OFF_DUTY_MINUTES} minutes")
-                log_start = current_datetime
-                log_end = current_datetime + timedelta(minutes=PARKING_OFF_DUTY_MINUTES)
-                DrivingLog.objects.create(
-                    trip=trip,
-                    status='OFF',
-                    location='Truck Stop',
-                    remarks='Parking, meal and rest',
-                    start_time=log_start,
-                    end_time=log_end
-                )
-                current_datetime = log_end
-
-                # 8. Fill remaining time until midnight with Sleeper Berth
-                if current_datetime < day_end:
-                    print("\nCreating sleeper berth log for remaining time")
-                    DrivingLog.objects.create(
-                        trip=trip,
-                        status='SB',
-                        location='Truck Stop Sleeper',
-                        remarks='Sleeper berth rest',
-                        start_time=current_datetime,
-                        end_time=day_end
-                    )
-
-                # Create daily log summary
-                print("\nCreating daily log summary")
-                day_logs = DrivingLog.objects.filter(trip=trip, start_time__date=day_start)
-                driving_hours_total = sum((log.end_time - log.start_time).total_seconds() for log in day_logs if log.status == 'D') / 3600
-                on_duty_hours_total = sum((log.end_time - log.start_time).total_seconds() for log in day_logs if log.status == 'ON') / 3600
-                off_duty_hours_total = sum((log.end_time - log.start_time).total_seconds() for log in day_logs if log.status == 'OFF') / 3600
-                sleeper_berth_hours_total = sum((log.end_time - log.start_time).total_seconds() for log in day_logs if log.status == 'SB') / 3600
-
-                print(f"Day {day + 1} Summary:")
-                print(f"Driving hours: {driving_hours_total:.2f}")
-                print(f"On duty hours: {on_duty_hours_total:.2f}")
-                print(f"Off duty hours: {off_duty_hours_total:.2f}")
-                print(f"Sleeper berth hours: {sleeper_berth_hours_total:.2f}")
-
-                DailyLogSheet.objects.create(
-                    trip=trip,
-                    date=day_start,
-                    driving_hours=round(driving_hours_total, 2),
-                    on_duty_hours=round(on_duty_hours_total, 2),
-                    off_duty_hours=round(off_duty_hours_total, 2),
-                    sleeper_berth_hours=round(sleeper_berth_hours_total, 2)
-                )
-
-            # Update trip status
-            print("\nUpdating trip status to IN_PROGRESS")
-            trip.status = 'IN_PROGRESS'
-            trip.save()
+                        status=interval.status,
+                        location=self.get_log_location(trip, interval, trip_start),
+                        remarks=planner.ACTIVITIES[interval.activity],
+                        start_time=interval.start,
+                        end_time=interval.end
+                    ))
+
+                duty_starts = [interval.start for interval in day_intervals if interval.status in ('ON', 'D')]
+                if duty_starts:
+                    start_hours.append(duty_starts[0].hour)
+
+                # Daily log summary from the planned entries (the totals are stored when the logs are saved)
+                hours_by_status = planner.hours_by_status(day_intervals)
+                print(f"Day {day_number} Summary:")
+                print(f"Driving hours: {hours_by_status['D']:.2f}")
+                print(f"On duty hours: {hours_by_status['ON']:.2f}")
+                print(f"Off duty hours: {hours_by_status['OFF']:.2f}")
+                print(f"Sleeper berth hours: {hours_by_status['SB']:.2f}")
+
+            # Write all logs and update trip status together
+            print(f"\nSaving {len(driving_logs)} driving logs for {len(days)} days")
+            print("Updating trip status to IN_PROGRESS")
+            with transaction.atomic():
+                DrivingLog.objects.bulk_create(driving_logs)
+                # bulk_create skips the signals that maintain the daily totals
+                aggregates.apply_logs(driving_logs)
+                trip.status = 'IN_PROGRESS'
+                trip.save(update_fields=['status'])
 
             print("\n=== Trip Log Generation Complete ===")
             return Response({
                 "message": "Trip logs generated successfully",
-                "days_generated": days_needed,
+                "days_generated": len(days),
                 "total_distance": route_info['total_distance'],
                 "total_driving_hours": route_info['base_driving_time'],
                 "start_hours": start_hours
@@ -1303,18 +1112,78 @@ class GenerateTripLogsView(APIView):
 
     def calculate_distance(self, lat1, lon1, lat2, lon2):
         """Calculate distance between two points in miles using the Haversine formula"""
-        R = 3959  # Earth's radius in miles
-        
-        # Convert decimal degrees to radians
-        lat1, lon1, lat2, lon2 = map(math.radians, [float(lat1), float(lon1), float(lat2), float(lon2)])
-        
-        # Haversine formula
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a))
-        
-        # Calculate the distance
-        distance = R * c
-        
-        return distance
+        return geometry.haversine_miles(lat1, lon1, lat2, lon2)
+
+class BatchTripPlanView(APIView):
+    """Plan many pickup/dropoff pairs at once for dispatchers pricing loads"""
+    permission_classes = [IsAuthenticated, IsAdminOrSupervisor]
+
+    def resolve_coordinates(self, loads):
+        """Geocode any load given by address; returns {index: error} for loads that could not be resolved"""
+        lookups = []
+        for index, load in enumerate(loads):
+            for end in ('pickup', 'dropoff'):
+                if not load.get(f'{end}_coordinates'):
+                    lookups.append((index, end, load[f'{end}_location']))
+
+        # Cache hits in one query. Nominatim allows one request per second, so only a few
+        # misses are looked up per request; the rest come back as errors to retry later,
+        # by which time the addresses looked up so far are cached
+        coordinates = cached_geocodes(address for _, _, address in lookups)
+        budget = getattr(settings, 'BATCH_GEOCODE_LIMIT', 5)
+        errors = {}
+        for index, end, address in lookups:
+            if index in errors:
+                continue
+            coords = coordinates[address]
+            if coords is MISSING:
+                if budget <= 0:
+                    errors[index] = f"Too many uncached addresses to geocode {end} location now: {address}"
+                    continue
+                budget -= 1
+                coords = coordinates[address] = geocode_uncached(address)
+            if coords:
+                loads[index][f'{end}_coordinates'] = list(coords)
+            else:
+                errors[index] = f"Could not geocode {end} location: {address}"
+        return errors
+
+    def wants_stream(self, request):
+        return (
+            request.query_params.get('stream') in ('1', 'true') or
+            'application/x-ndjson' in request.META.get('HTTP_ACCEPT', '')
+        )
+
+    def post(self, request):
+        serializer = BatchPlanSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        loads = [dict(load) for load in serializer.validated_data['loads']]
+        start_time = serializer.validated_data.get('start_time') or timezone.localtime()
+        for load in loads:
+            load['start_time'] = start_time
+            load['include_schedule'] = serializer.validated_data['include_schedule']
+
+        errors = self.resolve_coordinates(loads)
+        pending = [index for index in range(len(loads)) if index not in errors]
+
+        def results():
+            for index, error in errors.items():
+                yield index, {"reference": loads[index].get('reference'), "error": error}
+            for position, result in batch.plan_loads([loads[index] for index in pending]):
+                yield pending[position], result
+
+        if self.wants_stream(request):
+            # One JSON object per line, in completion order
+            lines = (json.dumps(dict(result, index=index)) + "\n" for index, result in results())
+            if isinstance(request._request, ASGIRequest):
+                # Django buffers synchronous iterators under ASGI; an async one streams
+                lines = iterate_in_thread(lines)
+            return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+        planned = sorted(results(), key=lambda item: item[0])
+        return Response({
+            "count": len(planned),
+            "results": [dict(result, index=index) for index, result in planned]
+        }, status=status.HTTP_200_OK)